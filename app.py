@@ -1,39 +1,112 @@
 # app.py
+# Time the imports below for the startup report (see create_app)
+from utils import startup
+startup.install_import_timer()
+
 from flask import (
     Flask, render_template, request, redirect, session,
-    url_for, flash, jsonify, send_from_directory
+    url_for, flash, jsonify, abort, Response,
+    stream_template
 )
 import os
+import io
 import json
 import re
+import hashlib
+import gc
+import click
 from datetime import datetime, timedelta
 from collections import namedtuple
 from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.http import is_resource_modified
+from markupsafe import Markup
 
 # App services
 from services.user_manager import (
-    register_user, get_user_by_username, update_user
+    register_user, get_user_by_username, update_user, warm_user_cache
 )
 from services.auth_service import authenticate
 from services.product_manager import add_product, list_products
 from services import product_manager  # If needed for other direct calls
 from services.shopping_cart_service import add_to_cart, calculate_cart_total
-from services.order_service import create_order
-from services.report_generator import ReportGenerator
+from services.order_service import create_order, get_orders_for_user
+from services import order_store
+from services.report_jobs import report_jobs, ReportPending
+from services.product_import import import_feed, feed_format
+from services import product_api
+from services.recommendations import related_products, rebuild_index, init_index
+from services.facets import filter_products, get_facet_index
+from services import sales_series
+from services.task_queue import task_queue
+from services.stock_holds import stock_holds
+from services.idempotency import idempotency_store, new_checkout_key, key_matches_cart
 
 # Utility functions
 from utils.storage import load_data, save_data
+from utils.change_feed import change_feed
+from utils.profiling import init_profiling
+from utils.render_cache import RenderCache
+from utils.compression import init_compression
+from utils.rate_limit import init_rate_limiting
+from utils.assets import build_assets, init_assets, precompile_templates
 
 # Models
 from models.user import User
 
+# Imports are timed; stop wrapping module loaders for the rest of the process
+startup.uninstall_import_timer()
+
 # Flask app config
 app = Flask(__name__)
 app.secret_key = 'awe-secret-key'  # Required for session management
 
+# Compress responses the client accepts (br/gzip); streamed pages chunk by chunk
+init_compression(app)
+
+# Per-client rate limits on costly routes and load shedding (see utils/rate_limit.py)
+app.config['MAX_IN_FLIGHT'] = int(os.environ.get('AWE_MAX_IN_FLIGHT', 32))
+rate_limiter = init_rate_limiting(app)
+
+# Request profiling (off unless AWE_PROFILING=1)
+app.config['PROFILING_ENABLED'] = os.environ.get('AWE_PROFILING') == '1'
+app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get('AWE_PROFILING_SAMPLE_RATE', 0.05))
+app.config['PROFILING_THRESHOLD_MS'] = float(os.environ.get('AWE_PROFILING_THRESHOLD_MS', 500))
+profile_store = init_profiling(app)
+
+# Rendered product cards and detail pages, dropped per product when it changes
+render_cache = RenderCache()
+product_manager.on_product_invalidated(render_cache.invalidate)
+
+# Rendered receipts, kept apart so they never evict product cards
+receipt_cache = RenderCache(max_entries=200)
+
+# Drop cached receipts of orders another worker placed or canceled
+def invalidate_order_receipts(resource, order_ids):
+    if order_ids is None:
+        receipt_cache.clear()
+        return
+    for order_id in order_ids:
+        receipt_cache.invalidate(order_id)
+
+change_feed.subscribe(order_store.ORDERS_DIR, invalidate_order_receipts)
+
+# Pick up writes made by other workers before handling each request
+@app.before_request
+def poll_change_feed():
+    change_feed.poll()
+
+# Background workers for deferred order processing. Started on the first
+# request of each process, so a server that forks after create_app() gets
+# live threads in every worker.
+@app.before_request
+def start_background_workers():
+    task_queue.start()
+
+# Fingerprinted static assets (built with `flask --app app build-assets`)
+asset_manifest = init_assets(app)
+
 # File paths
 PRODUCTS_FILE = 'data/products.json'
-ORDERS_FILE = 'orders.json'
 
 """
     Authenticate user by comparing provided credentials
@@ -80,19 +153,12 @@ def is_strong_password(password):
     - price_min: minimum price
     - price_max: maximum price
     - keyword: case-insensitive keyword match in product name
+    - price_below: prices strictly below this (used by the price band links)
 """
-def list_products_filtered(category=None, price_min=None, price_max=None, keyword=None):
-    products = list_products()
-    if category:
-        products = [p for p in products if p.category == category]
-    if price_min:
-        products = [p for p in products if p.price >= price_min]
-    if price_max:
-        products = [p for p in products if p.price <= price_max]
-    if keyword:
-        keyword_lower = keyword.lower()
-        products = [p for p in products if keyword_lower in p.name.lower()]
-    return products
+def list_products_filtered(category=None, price_min=None, price_max=None, keyword=None,
+                           price_below=None):
+    # Answered from the precomputed facet bitsets instead of rescanning the catalog
+    return filter_products(category, price_min, price_max, keyword, price_below)
 
 """
     Loads and returns JSON data from a file.
@@ -107,40 +173,43 @@ def load_json(filename):
 
 """
     Saves data to a JSON file with indentation.
+    Goes through save_data so the write reaches the change feed.
 """
 def save_json(filename, data):
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
+    save_data(filename, data)
 
 """
-    Filters orders that were placed on or after the given start_date.
-    - start_date should be a datetime object.
+    Returns a 304 Not Modified response if the client's cached copy
+    (If-None-Match / If-Modified-Since) is still current, else None.
 """
-def filter_orders_by_timeframe(orders, start_date):
-    filtered = []
-    for order in orders:
-        order_date = datetime.strptime(order["date"], "%Y-%m-%d %H:%M:%S")
-        if order_date >= start_date:
-            filtered.append(order)
-    return filtered
+def not_modified_response(etag, last_modified, private=False):
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return set_cache_headers(Response(status=304), etag, last_modified, private)
 
 """
-    Calculates total quantity sold and total profit for each product.
-    Returns a dictionary keyed by product_id.
+    Last-Modified for catalog pages: the later of the last catalog change
+    and the last asset build, since the pages link the fingerprinted files.
 """
-def calculate_stats(products, orders):
-    stats = {p["product_id"]: {"sold": 0, "profit": 0.0} for p in products}
-    product_map = {p["product_id"]: p for p in products}
-
-    for order in orders:
-        for item in order["items"]:
-            pid = item["product_id"]
-            qty = item["quantity"]
-            if pid in product_map:
-                price = product_map[pid]["price"]
-                stats[pid]["sold"] += qty
-                stats[pid]["profit"] += price * qty
-    return stats
+def catalog_page_last_modified():
+    last_modified = product_manager.get_catalog_last_modified()
+    built_at = app.extensions["assets_built_at"]
+    if last_modified and built_at:
+        return max(last_modified, built_at)
+    return last_modified or built_at
+
+"""
+    Adds ETag/Last-Modified validators to a response and tells clients
+    to revalidate before reusing it.
+"""
+def set_cache_headers(response, etag, last_modified, private=False):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return response
 
 # Redirect root URL to login page
 @app.route('/')
@@ -230,7 +299,7 @@ def register():
             phone_number=phone_number  
         )
         users.append(new_user.to_dict())
-        save_data("data/users.json", users)
+        save_data("data/users.json", users, changed_keys=[username])
         flash("Account created successfully! Please log in.", "success")
         return redirect(url_for('login'))
 
@@ -293,52 +362,104 @@ def products():
     page = int(request.args.get('page', 1)) # Current page number
     per_page = 3 # Items per page
 
+    # The page also shows cart size and login state, and links the current
+    # asset build, so they are part of the ETag
+    catalog_version = product_manager.get_catalog_version()
+    last_modified = catalog_page_last_modified()
+    cart_count = len(session.get('cart', []))
+    username = session.get('user', {}).get('username', '')
+    etag = hashlib.sha1(
+        f"{catalog_version}|{app.extensions['asset_version']}|{request.full_path}"
+        f"|{cart_count}|{username}".encode()
+    ).hexdigest()
+
+    # Pending flash messages are shown once, so never answer 304 while they exist
+    has_flashes = '_flashes' in session
+    if not has_flashes:
+        cached = not_modified_response(etag, last_modified, private=True)
+        if cached:
+            return cached
+
     # Optional filters
     category = request.args.get('category')
     price_min = request.args.get('price_min', type=float)
     price_max = request.args.get('price_max', type=float)
+    price_below = request.args.get('price_below', type=float)
     keyword = request.args.get('keyword')
     
     # Filter and paginate products
-    filtered_products = list_products_filtered(category, price_min, price_max, keyword)
+    filtered_products = list_products_filtered(category, price_min, price_max, keyword, price_below)
     total = len(filtered_products)
     start = (page - 1) * per_page
     end = start + per_page
     paginated = filtered_products[start:end]
     total_pages = (total + per_page - 1) // per_page
 
-    # Get unique categories for the filter dropdown
-    all_products = list_products()
-    categories = sorted(set(p.category for p in all_products))
+    # Categories and live facet counts for the filter bar
+    facet_counts = get_facet_index().counts(category, price_min, price_max, keyword, price_below)
+    categories = list(facet_counts["categories"])
+
+    # Product cards are rendered once per product version and reused
+    cards = [
+        Markup(render_cache.get_or_render(
+            'card', p.product_id, product_manager.get_product_version(p.product_id),
+            lambda p=p: render_template('product_card.html', product=p)
+        ))
+        for p in paginated
+    ]
 
     # Render product list
-    return render_template(
+    html = render_template(
         'list_products.html',
         products=paginated,
+        cards=cards,
         page=page,
         total_pages=total_pages,
         categories=categories,
+        facets=facet_counts,
         selected_category=category or '',
         price_min=price_min or '',
         price_max=price_max or '',
         keyword=keyword or ''
     )
+    if has_flashes:
+        return html
+    return set_cache_headers(app.make_response(html), etag, last_modified, private=True)
 
 # Show individual product details
 @app.route('/product/<product_id>')
 def product_detail(product_id):
-    def products():
-        # Load products from JSON using absolute path
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        json_path = os.path.join(base_dir, 'data', 'products.json')
-        with open(json_path) as f:
-            return json.load(f)
-
-    # Find the product by ID
-    product = next((p for p in products() if p["product_id"] == product_id), None)
-    if not product:
+    # The product's content hash changes on edit, stock change or removal
+    product_version = product_manager.get_product_version(product_id)
+    if product_version is None:
         abort(404)
-    return render_template('product_detail.html', product=product)
+
+    # Precomputed "frequently bought together" products that still exist
+    related_ids = [
+        pid for pid in related_products(product_id)
+        if product_manager.get_product_version(pid) is not None
+    ]
+    # The page changes when the product, any of its related products or the
+    # asset build it links change
+    version = hashlib.sha1("|".join(
+        [product_version, app.extensions['asset_version']]
+        + [f"{pid}:{product_manager.get_product_version(pid)}" for pid in related_ids]
+    ).encode()).hexdigest()[:16]
+    last_modified = catalog_page_last_modified()
+    cached = not_modified_response(version, last_modified)
+    if cached:
+        return cached
+
+    # Reuse the rendered page until this product changes
+    html = render_cache.get_or_render(
+        'detail', product_id, version,
+        lambda: render_template(
+            'product_detail.html',
+            product=product_manager.get_product_by_id(product_id),
+            related=[product_manager.get_product_by_id(pid) for pid in related_ids]
+        )
+    )
+    return set_cache_headers(app.make_response(html), version, last_modified)
 
 # Log out current user by clearing the session
 @app.route('/logout')
@@ -361,6 +482,14 @@ def add_product_to_cart(product_id):
         return redirect('/products')
 
     cart = session['cart']
+    # Don't let the cart exceed stock that isn't held by other customers
+    in_cart = sum(item['quantity'] for item in cart if item['product_id'] == product_id)
+    username = session.get('user', {}).get('username')
+    available = product_manager.get_available_stock(product_id, exclude_owner=username)
+    if in_cart + quantity > available:
+        flash(f"Only {available} of {product.name} available right now.")
+        return redirect('/products')
+
     # Update quantity if product already in cart
     for item in cart:
         if item['product_id'] == product_id:
@@ -385,6 +514,9 @@ def remove_from_cart(product_id):
     cart = session.get('cart', [])
     cart = [item for item in cart if item['product_id'] != product_id]
     session['cart'] = cart
+    # The checkout hold no longer matches the cart
+    if 'user' in session:
+        stock_holds.release(session['user']['username'])
     flash("Item removed from cart")
     return redirect('/cart')
 
@@ -406,24 +538,60 @@ def checkout():
     total = calculate_cart_total(cart)
 
     if request.method == 'POST':
+        # Retries and double-submits of a placed order return the original receipt
+        key = request.form.get('idempotency_key')
+        if key:
+            status, order_id = idempotency_store.claim(key)
+            if status == "done":
+                session['cart'] = []
+                return redirect(url_for('view_receipt', order_id=order_id))
+            if status == "pending":
+                flash("Your order is already being processed.")
+                return redirect(url_for('your_orders'))
+
         if not cart:
+            if key:
+                idempotency_store.release(key)
             flash("Your cart is empty.")
             return redirect('/products')
+
+        # The key is only valid for the cart shown on the confirmation page
+        if key and not key_matches_cart(key, cart):
+            idempotency_store.release(key)
+            flash("Your cart has changed. Please review your order again.")
+            return redirect('/checkout')
+
         # Create order and clear cart
-        order_id = create_order(username, cart)
+        try:
+            order_id = create_order(username, cart)
+        except Exception as e:
+            if key:
+                idempotency_store.release(key)
+            flash(str(e))
+            return redirect('/cart')
+        if key:
+            idempotency_store.complete(key, order_id)
         session['cart'] = []  
         return redirect(url_for('view_receipt', order_id=order_id))
 
-    # GET: Show confirmation page
+    # GET: Hold the cart's stock while the customer confirms the order
+    held, shortages = product_manager.hold_stock(username, cart)
+    if not held:
+        names = {item['product_id']: item['name'] for item in cart}
+        for product_id, available in shortages:
+            flash(f"Only {available} of {names.get(product_id, product_id)} available right now.")
+        return redirect('/cart')
+
+    # Show confirmation page with a key bound to this cart
     user = get_user_by_username(username)  # Make sure this is defined/imported
-    return render_template('checkout.html', cart=cart, total=total, user=user)
+    return render_template('checkout.html', cart=cart, total=total, user=user,
+                           idempotency_key=new_checkout_key(cart))
 
 # Admin dashboard for managing products
 @app.route('/admin', methods=['GET', 'POST'])
 def admin_dashboard():
-    products = load_json(PRODUCTS_FILE)
-    products = product_manager.list_products()
     if request.method == 'POST':
+        products = product_manager.list_products()
         # Get product info from form
         new_product = {
             "product_id": request.form['product_id'],
@@ -439,7 +607,9 @@ def admin_dashboard():
             save_json(PRODUCTS_FILE, products)
         # Redirect to refresh view
         return redirect(url_for('admin_dashboard'))
-    return render_template('admin_dashboard.html', products=products)
+    # Stream the page so the product table is sent (and compressed) as it is rendered
+    return Response(stream_template('admin_dashboard.html',
+                                    products=product_manager.iter_products()))
 
 # Route to handle adding a new product from the admin panel
 @app.route('/add-product', methods=['POST'])
@@ -454,55 +624,6 @@ def add_product_route():
     product_manager.add_product(name, price, stock, category, description)
     return redirect('/admin') # Redirect back to admin dashboard after adding
 
-# Helper function to filter orders based on a given start date
-def filter_orders_by_timeframe(orders, start_date):
-    filtered = []
-    for order in orders:
-        try:
-            # Print debug info
-            print("Checking order:", order["order_id"], order["date"])
-            # Parse the date string from order
-            order_date = datetime.strptime(order["date"], "%Y-%m-%d %H:%M:%S")
-            print("Parsed date:", order_date, "Start date:", start_date)
-            
-            # Include order if it falls within the timeframe
-            if order_date >= start_date:
-                print("Included")
-                filtered.append(order)
-            else:
-                print("Excluded")
-        except ValueError as e:
-            # Handle date format errors gracefully
-            print(f"Date parsing error: {e} in order {order}")
-    print("Total filtered orders:", len(filtered))
-    return filtered
-
-# Calculate total units sold and profit per product based on filtered orders
-def calculate_stats(products, orders):
-     # Initialize stats dictionary for each product
-    stats = {p["product_id"]: {"sold": 0, "profit": 0.0} for p in products}
-    product_map = {p["product_id"]: p for p in products}
-
-    for order in orders:
-        for item in order["items"]:
-            pid = item["product_id"]
-            qty = item["quantity"]
-            price = item.get("price")
-
-            # If product wasn't initialized in stats, add it (failsafe)
-            if pid not in stats:
-                stats[pid] = {"sold": 0, "profit": 0.0}
-             
-            # If price is missing, fall back to product price
-            if price is None and pid in product_map:
-                price = product_map[pid]["price"]
-
-            # Accumulate sales and profit if price is available
-            if price is not None:
-                stats[pid]["sold"] += qty
-                stats[pid]["profit"] += price * qty
-    return stats
-
 # API endpoint to return sales stats for the specified timeframe
 @app.route('/api/stats')
 def api_stats():
@@ -522,15 +643,15 @@ def api_stats():
         else:
             start_date = now - timedelta(days=30)
 
-        # Load product and order data
-        products = load_json(PRODUCTS_FILE)
-        orders = load_json(ORDERS_FILE)
-        # Filter and compute stats
-        filtered_orders = filter_orders_by_timeframe(orders, start_date)
-        stats = calculate_stats(products, filtered_orders)
-        # Debugging output
-        print("Filtered Orders:", filtered_orders)
-        print("Start Date:", start_date)
+        # Aggregate in the report process pool; slow runs become a pollable job
+        try:
+            stats = report_jobs.run("sales_stats", start=start_date)
+        except ReportPending as pending:
+            return jsonify({
+                "status": "pending",
+                "job_id": pending.job_id,
+                "poll_url": url_for('report_job_status', job_id=pending.job_id)
+            }), 202
         # Return stats as JSON
         return jsonify(stats)
     except Exception as e:
@@ -545,20 +666,100 @@ def your_orders():
         return redirect('/login') # Require login to view orders
 
     username = session['user']['username']
-    from services.order_service import get_orders_for_user
     orders = get_orders_for_user(username) # Fetch orders by username
     return render_template('your_orders.html', orders=orders)
 
-# Route to serve the raw JSON file of all orders (for admin or API use)
+# Sales over time for the admin chart, from pre-aggregated hourly buckets:
+#   ?start=YYYY-MM-DD&end=YYYY-MM-DD   range (default: first sale until now)
+#   ?resolution=hour|day|week|month    default: chosen from the range
+#   ?points=N                          downsample to at most N points (LTTB)
+@app.route('/api/sales/series')
+def api_sales_series():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.strptime(start, "%Y-%m-%d") if start else None
+        # The end date is inclusive
+        end = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1, seconds=-1) if end else None
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+    points = min(max(request.args.get('points', sales_series.DEFAULT_POINTS, type=int), 3), 2000)
+    try:
+        series = sales_series.sales_series(start, end, request.args.get('resolution') or None, points)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(series)
+
+# Route to serve orders as JSON (for admin or API use)
+# Optional ?since=YYYY-MM-DD limits the partitions that are read
 @app.route('/orders.json')
 def orders_json():
-    return send_from_directory('data', 'orders.json') 
+    since = request.args.get('since')
+    try:
+        start = datetime.strptime(since, "%Y-%m-%d") if since else None
+    except ValueError:
+        return jsonify({"error": "since must be YYYY-MM-DD"}), 400
+    return jsonify(order_store.load_orders(start=start))
+
+"""
+    JSON response for the product API: answers 304 while the catalog is
+    unchanged (compression is done by init_compression).
+"""
+def product_api_response(build):
+    etag = hashlib.sha1(
+        f"{product_manager.get_catalog_version()}|{request.full_path}".encode()
+    ).hexdigest()
+    last_modified = product_manager.get_catalog_last_modified()
+    cached = not_modified_response(etag, last_modified)
+    if cached:
+        return cached
+    try:
+        body, status = build()
+    except product_api.ApiError as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify(body)
+    response.status_code = status
+    if status == 200:
+        set_cache_headers(response, etag, last_modified)
+    return response
+
+# Read-only product API for the mobile client and partners:
+#   ?fields=name,price   only these fields (product_id is always included)
+#   ?ids=P001,P002       batched lookup instead of a page
+#   ?cursor=...&limit=N  next page, using next_cursor from the previous one
+@app.route('/api/products')
+def api_products():
+    def build():
+        fields = product_api.parse_fields(request.args.get('fields'))
+        if request.args.get('ids'):
+            found, missing = product_api.get_many(
+                product_api.parse_ids(request.args['ids']), fields)
+            return {"products": found, "missing": missing}, 200
+        page, next_cursor = product_api.list_page(
+            request.args.get('cursor'), product_api.parse_limit(request.args.get('limit')), fields)
+        return {"products": page, "next_cursor": next_cursor}, 200
+    return product_api_response(build)
+
+# Single product as JSON (?fields= works here too)
+@app.route('/api/products/<product_id>')
+def api_product(product_id):
+    def build():
+        fields = product_api.parse_fields(request.args.get('fields'))
+        product = product_manager.get_product_dict(product_id)
+        if not product:
+            return {"error": "Product not found"}, 404
+        return product_api.project(product, fields), 200
+    return product_api_response(build)
 
 # Route to handle cancel order requests by order_id
 @app.route('/cancel_order/<order_id>', methods=['POST'])
 def cancel_order_route(order_id):
     from services.order_service import cancel_order
-    success = cancel_order(order_id) # Call service to cancel order
+    success, _ = cancel_order(order_id) # Call service to cancel order
+    receipt_cache.invalidate(order_id) # Drop the cached receipt
     
     if success:
         flash(' Order canceled successfully.')
@@ -569,11 +770,14 @@ def cancel_order_route(order_id):
 # Route to display receipt page for a specific order
 @app.route('/receipt/<order_id>')
 def view_receipt(order_id):
-    orders = load_data("data/orders.json")
-    order = next((o for o in orders if o["order_id"] == order_id), None)
+    order = order_store.find_order(order_id)
     if not order:
         return "Receipt not found", 404 # Show 404 if not found
-    return render_template("receipt.html", order=order)
+    # Rendered once per order status; a canceled order renders again
+    return receipt_cache.get_or_render(
+        'receipt', order_id, order["status"],
+        lambda: render_template("receipt.html", order=order)
+    )
 
 # Route to update product stock after a sale (manual sale via admin panel)
 @app.route('/sell-product', methods=['POST'])
@@ -593,22 +797,22 @@ def sell_product():
 # Edit product details via admin panel
 @app.route('/edit-product/<product_id>', methods=['GET', 'POST'])
 def edit_product(product_id):
-    products = load_json(PRODUCTS_FILE)
-    product = next((p for p in products if p['product_id'] == product_id), None)
+    product = product_manager.get_product_by_id(product_id)
 
     if not product:
         flash('Product not found.')
         return redirect('/admin')
 
     if request.method == 'POST':
-        # Update fields from form
-        product['name'] = request.form['name']
-        product['price'] = float(request.form['price'])
-        product['stock'] = int(request.form['stock'])
-        product['category'] = request.form.get('category', 'Uncategorized')
-        product['description'] = request.form.get('description', '')
-
-        save_json(PRODUCTS_FILE, products)
+        # Update fields from form (product manager invalidates cached pages)
+        product_manager.edit_product(
+            product_id,
+            name=request.form['name'],
+            price=float(request.form['price']),
+            stock=int(request.form['stock']),
+            category=request.form.get('category', 'Uncategorized'),
+            description=request.form.get('description', '')
+        )
         flash('Product updated successfully.')
         return redirect('/admin')
     return render_template('edit_product.html', product=product)
@@ -616,30 +820,220 @@ def edit_product(product_id):
 # Route to delete a product from the system
 @app.route('/delete-product/<product_id>', methods=['POST'])
 def delete_product(product_id):
-    products = load_json(PRODUCTS_FILE)
-    updated_products = [p for p in products if p['product_id'] != product_id]
+    success, _ = product_manager.remove_product(product_id)
 
-    if len(products) == len(updated_products):
+    if not success:
         flash('Product not found.')
     else:
-        save_json(PRODUCTS_FILE, updated_products)
         flash('Product deleted successfully.')
     return redirect('/admin')
 
+# Bulk product import: upload a CSV or JSON-lines feed, applied in one write
+@app.route('/admin/products/import', methods=['POST'])
+def import_products():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    feed = request.files.get('feed')
+    if not feed or not feed.filename:
+        return jsonify({"error": "No feed file uploaded"}), 400
+    try:
+        fmt = feed_format(feed.filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Stream the upload row by row instead of reading it into memory
+    stream = io.TextIOWrapper(feed.stream, encoding='utf-8-sig', newline='')
+    dry_run = request.form.get('dry_run') == '1'
+    summary = import_feed(stream, fmt, dry_run=dry_run)
+    return jsonify(summary), (400 if summary["errors"] else 200)
+
+"""
+    Runs a report in the report process pool for an admin page.
+    Returns (result, None), or (None, response) with a self-refreshing
+    "being prepared" page if the report takes longer than the timeout;
+    that page comes back with ?job=<id> until the job is done. An unknown
+    or expired job is a 404, never a new job.
+"""
+def report_page_result(kind, title, **params):
+    job_id = request.args.get('job')
+    if job_id:
+        job = report_jobs.get(job_id)
+        if not job or job["kind"] != kind:
+            abort(404, description="Report job not found or expired. Open the report again.")
+        if job["status"] == "done":
+            return job["result"], None
+        if job["status"] == "failed":
+            abort(500, description=job["error"])
+    else:
+        try:
+            return report_jobs.run(kind, **params), None
+        except ReportPending as pending:
+            job_id = pending.job_id
+    return None, render_template('report_pending.html', title=title,
+                                 refresh_url=url_for(request.endpoint, job=job_id))
+
 # Admin view for generating and displaying a financial report
 @app.route('/admin/reports/financial')
 def financial_report():
-    report_gen = ReportGenerator()
-    report = report_gen.generate_financial_report()
+    report, pending = report_page_result("financial", "Financial Report")
+    if pending:
+        return pending
     return render_template('financial_report.html', report=report)
 
 # Admin view for generating and displaying a stock report
 @app.route('/admin/reports/stock')
 def stock_report():
-    report_gen = ReportGenerator()
-    report = report_gen.generate_stock_report()
-    return render_template('stock_report.html', stock=report)
+    # Read straight from the cached catalog (no report job), one row at a time
+    return Response(stream_template('stock_report.html',
+                                    stock=product_manager.iter_products(ordered=True)))
+
+# Status (and result, once done) of a report job, for clients polling after a 202
+@app.route('/api/report-jobs/<job_id>')
+def report_job_status(job_id):
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# Report pool counters: queue depth and queue/run times per report kind
+@app.route('/admin/reports/jobs')
+def report_jobs_summary():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    return jsonify(report_jobs.summary())
+
+# Admin view listing captured slow-request profiles
+@app.route('/admin/profiles')
+def admin_profiles():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        flash("Access denied.")
+        return redirect("/login")
+    return render_template(
+        'profiles.html',
+        profiles=profile_store.list_entries(),
+        enabled=app.config['PROFILING_ENABLED'],
+        threshold_ms=app.config['PROFILING_THRESHOLD_MS']
+    )
+
+# Download a captured profile in pstats format
+@app.route('/admin/profiles/<profile_id>.pstats')
+def download_profile(profile_id):
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        abort(403)
+    entry = profile_store.get(profile_id)
+    if not entry:
+        abort(404)
+    return Response(
+        entry["pstats"],
+        mimetype='application/octet-stream',
+        headers={'Content-Disposition': f'attachment; filename={profile_id}.pstats'}
+    )
+
+# Rate limiter and load shedding counters, for tuning the limits
+@app.route('/admin/limits')
+def admin_limits():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    return jsonify(rate_limiter.stats())
+
+# Admin view of the startup cost per module import and warm-up phase
+@app.route('/admin/startup')
+def admin_startup():
+    user = session.get("user")
+    if not user or user["role"] != "admin":
+        flash("Access denied.")
+        return redirect("/login")
+    return render_template('startup.html', report=startup.startup_report())
+
+# CLI command: minify and fingerprint static assets and write the manifest
+@app.cli.command('build-assets')
+def build_assets_command():
+    manifest = build_assets(app.static_folder)
+    for name, path in manifest.items():
+        print(f"{name} -> {path}")
+
+# CLI command: bulk import a product feed from a CSV or JSON-lines file
+@app.cli.command('import-products')
+@click.argument('path')
+@click.option('--dry-run', is_flag=True, help='Validate the feed without writing.')
+def import_products_command(path, dry_run):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        summary = import_feed(f, feed_format(path), dry_run=dry_run)
+    print(json.dumps(summary, indent=4))
+    if summary["errors"]:
+        raise SystemExit(1)
+
+# CLI command: compress old monthly order partitions into the archive
+@app.cli.command('archive-orders')
+@click.option('--keep-months', default=order_store.ARCHIVE_AFTER_MONTHS,
+              help='Months of orders to keep in the active tier.')
+def archive_orders_command(keep_months):
+    archived = order_store.archive_old_partitions(keep_months=keep_months)
+    print(f"Archived partitions: {', '.join(archived) or 'none'}")
+
+# CLI command: rebuild the "frequently bought together" index from all orders
+@app.cli.command('build-recommendations')
+def build_recommendations_command():
+    products = rebuild_index()
+    print(f"Indexed {products} products")
+
+# CLI command: rebuild the hourly sales buckets behind the sales chart from all orders
+@app.cli.command('build-sales-series')
+def build_sales_series_command():
+    hours = sales_series.rebuild_buckets()
+    print(f"Built {hours} hourly buckets")
+
+# Orders from this many days back are loaded during warm-up
+WARM_UP_ORDER_DAYS = 31
+
+"""
+    Load and index everything the first requests would otherwise load:
+    templates, the catalog with its facet and recommendation indexes,
+    users and the recent order partitions.
+"""
+def warm_up():
+    with startup.phase("templates"):
+        # Compile all templates and keep their bytecode on disk
+        precompile_templates(app, os.path.join(app.root_path, '.jinja_cache'))
+    with startup.phase("products"):
+        product_manager.load_catalog()
+    with startup.phase("facets"):
+        get_facet_index()
+    with startup.phase("recommendations"):
+        init_index()
+    with startup.phase("users"):
+        warm_user_cache()
+    with startup.phase("recent orders"):
+        order_store.load_orders(start=datetime.now() - timedelta(days=WARM_UP_ORDER_DAYS))
+    with startup.phase("sales buckets"):
+        sales_series.init_buckets()
+
+"""
+    App factory for production servers. Warms the caches before the server
+    forks its workers (e.g. gunicorn --preload "app:create_app()"), then
+    moves everything allocated so far out of the garbage collector's reach
+    with gc.freeze(), so collections in the workers do not write to (and
+    un-share) the pages inherited from the parent.
+"""
+def create_app(warm=True):
+    if warm:
+        warm_up()
+    report = startup.finish()
+    for row in report["phases"]:
+        app.logger.info("Warm-up %s: %.1f ms", row["phase"], row["ms"])
+    gc.collect()
+    gc.freeze()
+    return app
 
 # Start the Flask application in debug mode
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
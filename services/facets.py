@@ -0,0 +1,144 @@
+# services/facets.py
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from threading import Lock
+from models.product import Product
+from services import product_manager
+
+# Lower edges of the price bands shown in the filter bar (the last band is open-ended)
+PRICE_BUCKET_EDGES = [0, 50, 100, 250, 500, 1000]
+
+
+class FacetIndex:
+    """
+    Bitset index over the catalog for the /products filter bar.
+    Product i is bit i. Each category and price band has a precomputed
+    mask, so "how many products match if this facet were chosen, given
+    the other active filters" is an AND plus a popcount per facet value.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.all_mask = (1 << len(products)) - 1
+
+        self.category_masks = {}
+        for i, p in enumerate(products):
+            category = p.get("category", "Uncategorized")
+            self.category_masks[category] = self.category_masks.get(category, 0) | (1 << i)
+
+        self.bucket_masks = [0] * len(PRICE_BUCKET_EDGES)
+        for i, p in enumerate(products):
+            bucket = bisect_right(PRICE_BUCKET_EDGES, p["price"]) - 1
+            self.bucket_masks[max(bucket, 0)] |= 1 << i
+
+        # Products sorted by price with prefix masks: any price range is prefix[hi] ^ prefix[lo]
+        order = sorted(range(len(products)), key=lambda i: products[i]["price"])
+        self.sorted_prices = [products[i]["price"] for i in order]
+        self.price_prefix = [0]
+        for i in order:
+            self.price_prefix.append(self.price_prefix[-1] | (1 << i))
+
+        # Keyword masks need a scan of product names, so recent ones are kept
+        self.keyword_masks = OrderedDict()
+        self.keyword_lock = Lock()
+
+    def category_mask(self, category):
+        if not category:
+            return self.all_mask
+        return self.category_masks.get(category, 0)
+
+    def price_mask(self, price_min=None, price_max=None, price_below=None):
+        # Same semantics as the original filter: a missing/zero bound is ignored.
+        # price_max is inclusive; price_below is exclusive (price bands are [lo, hi))
+        lo = bisect_left(self.sorted_prices, price_min) if price_min else 0
+        hi = bisect_right(self.sorted_prices, price_max) if price_max else len(self.sorted_prices)
+        if price_below:
+            hi = min(hi, bisect_left(self.sorted_prices, price_below))
+        if hi <= lo:
+            return 0
+        return self.price_prefix[hi] ^ self.price_prefix[lo]
+
+    def keyword_mask(self, keyword):
+        if not keyword:
+            return self.all_mask
+        keyword = keyword.lower()
+        with self.keyword_lock:
+            if keyword in self.keyword_masks:
+                self.keyword_masks.move_to_end(keyword)
+                return self.keyword_masks[keyword]
+        mask = 0
+        for i, p in enumerate(self.products):
+            if keyword in p["name"].lower():
+                mask |= 1 << i
+        with self.keyword_lock:
+            self.keyword_masks[keyword] = mask
+            while len(self.keyword_masks) > 256:
+                self.keyword_masks.popitem(last=False)
+        return mask
+
+    def matching(self, category=None, price_min=None, price_max=None, keyword=None,
+                 price_below=None):
+        # Products matching all filters, in catalog order
+        mask = (self.category_mask(category) & self.price_mask(price_min, price_max, price_below)
+                & self.keyword_mask(keyword))
+        result = []
+        while mask:
+            low_bit = mask & -mask
+            result.append(self.products[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return result
+
+    def counts(self, category=None, price_min=None, price_max=None, keyword=None,
+               price_below=None):
+        """
+        Facet counts for the filter bar. Category counts apply the price and
+        keyword filters; price band counts apply the category and keyword
+        filters, so each facet shows what selecting it would return.
+        Band i covers [min, below); its link filters on exactly that range.
+        """
+        cat = self.category_mask(category)
+        price = self.price_mask(price_min, price_max, price_below)
+        kw = self.keyword_mask(keyword)
+
+        without_category = price & kw
+        categories = {name: (mask & without_category).bit_count()
+                      for name, mask in sorted(self.category_masks.items())}
+
+        without_price = cat & kw
+        price_buckets = []
+        for i, lo in enumerate(PRICE_BUCKET_EDGES):
+            hi = PRICE_BUCKET_EDGES[i + 1] if i + 1 < len(PRICE_BUCKET_EDGES) else None
+            price_buckets.append({
+                "min": lo,
+                "below": hi,
+                "count": (self.bucket_masks[i] & without_price).bit_count()
+            })
+
+        return {
+            "total": (cat & price & kw).bit_count(),
+            "all_categories": without_category.bit_count(),
+            "categories": categories,
+            "price_buckets": price_buckets
+        }
+
+
+# Facet index for the current catalog version
+_facets = {"version": None, "index": None}
+_facets_lock = Lock()
+
+
+def get_facet_index():
+    # Rebuild the index only when products.json has changed
+    version = product_manager.get_catalog_version()
+    with _facets_lock:
+        if _facets["version"] != version:
+            _facets["index"] = FacetIndex(product_manager.load_catalog())
+            _facets["version"] = version
+        return _facets["index"]
+
+
+def filter_products(category=None, price_min=None, price_max=None, keyword=None,
+                    price_below=None):
+    # Product objects matching the filters, in catalog order
+    matches = get_facet_index().matching(category, price_min, price_max, keyword, price_below)
+    return [Product.from_dict(p) for p in matches]
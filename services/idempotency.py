@@ -0,0 +1,125 @@
+# services/idempotency.py
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from utils.sqlite import SQLiteDB
+
+IDEMPOTENCY_DB = "data/idempotency.db"
+
+
+def cart_fingerprint(cart):
+    # Stable hash of the cart contents (order of items does not matter)
+    items = sorted(
+        (item["product_id"], item["quantity"], item.get("price")) for item in cart
+    )
+    return hashlib.sha1(json.dumps(items).encode("utf-8")).hexdigest()[:16]
+
+
+def new_checkout_key(cart):
+    # Issue a key bound to the cart snapshot shown on the checkout page
+    return f"{uuid.uuid4().hex}-{cart_fingerprint(cart)}"
+
+
+def key_matches_cart(key, cart):
+    # True if the key was issued for exactly this cart
+    return key.rsplit("-", 1)[-1] == cart_fingerprint(cart)
+
+
+class IdempotencyStore:
+    """
+    Expiring store mapping checkout keys to the order they created.
+    SQLite makes claims atomic across worker processes; completed keys
+    are also kept in a small in-memory LRU so replays skip the database.
+    """
+
+    def __init__(self, db_path=IDEMPOTENCY_DB, ttl_seconds=24 * 3600,
+                 max_entries=100000, memory_entries=10000, purge_every=500):
+        self.db_path = db_path
+        self.db = SQLiteDB(db_path, [
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            " key TEXT PRIMARY KEY,"
+            " order_id TEXT,"
+            " created REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idempotency_created ON idempotency_keys (created)",
+        ])
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.purge_every = purge_every
+        self.completed = OrderedDict()  # key -> (order_id, created)
+        self.lock = Lock()
+        self.claims = 0
+
+    def _remember(self, key, order_id, created):
+        with self.lock:
+            self.completed[key] = (order_id, created)
+            self.completed.move_to_end(key)
+            while len(self.completed) > self.memory_entries:
+                self.completed.popitem(last=False)
+
+    def lookup(self, key):
+        # Fast path: order_id for a completed key, or None
+        with self.lock:
+            entry = self.completed.get(key)
+        if entry and time.time() - entry[1] < self.ttl_seconds:
+            return entry[0]
+        return None
+
+    def claim(self, key):
+        """
+        Try to claim a key for a new order.
+        Returns ("new", None) if the caller should create the order,
+        ("done", order_id) if it already exists, or ("pending", None)
+        while another request with the same key is still running.
+        """
+        order_id = self.lookup(key)
+        if order_id:
+            return "done", order_id
+
+        self.claims += 1
+        if self.claims % self.purge_every == 0:
+            self.purge()
+
+        now = time.time()
+        # Expired keys can be claimed again
+        self.db.execute("DELETE FROM idempotency_keys WHERE key = ? AND created < ?",
+                        (key, now - self.ttl_seconds))
+        inserted = self.db.execute(
+            "INSERT OR IGNORE INTO idempotency_keys (key, order_id, created) VALUES (?, NULL, ?)",
+            (key, now)
+        ).rowcount
+        if inserted:
+            return "new", None
+        row = self.db.execute("SELECT order_id, created FROM idempotency_keys WHERE key = ?",
+                              (key,)).fetchone()
+
+        if row and row[0]:
+            self._remember(key, row[0], row[1])
+            return "done", row[0]
+        return "pending", None
+
+    def complete(self, key, order_id):
+        # Record the order created for a claimed key
+        self.db.execute("UPDATE idempotency_keys SET order_id = ? WHERE key = ?", (order_id, key))
+        self._remember(key, order_id, time.time())
+
+    def release(self, key):
+        # Drop a claim whose order failed so the user can retry with the same key
+        self.db.execute("DELETE FROM idempotency_keys WHERE key = ? AND order_id IS NULL", (key,))
+
+    def purge(self):
+        # Bulk-remove expired keys and cap the table at max_entries
+        self.db.execute("DELETE FROM idempotency_keys WHERE created < ?",
+                        (time.time() - self.ttl_seconds,))
+        self.db.execute(
+            "DELETE FROM idempotency_keys WHERE key IN ("
+            " SELECT key FROM idempotency_keys ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+# Shared store used by the checkout route
+idempotency_store = IdempotencyStore()
@@ -1,39 +1,25 @@
 import uuid
+import logging
 from datetime import datetime
-from utils.storage import load_data, save_data
-from services.product_manager import increase_stock, reduce_stock
+from services.product_manager import release_stock, reserve_stock, get_product_by_id
+from services.task_queue import task_queue
+from services import order_store
 
-ORDERS_FILE = "data/orders.json"
+LOW_STOCK_THRESHOLD = 5
 
-def load_orders():
-    # Load all orders from JSON file; return empty list if file not found
-    try:
-        return load_data(ORDERS_FILE)
-    except FileNotFoundError:
-        return []
+logger = logging.getLogger(__name__)
 
-def save_orders(orders):
-    # Save the list of orders back to the JSON file
-    save_data(ORDERS_FILE, orders)
+def load_orders(start=None, end=None, include_canceled=False):
+    # Load orders from the monthly partitions overlapping the given range
+    return order_store.load_orders(start, end, include_canceled)
 
 def create_order(username, cart):
-    orders = load_orders()
-    products = load_data("data/products.json")
+    # Check and reduce stock for the whole cart in a single write,
+    # converting the customer's checkout hold into the sale
+    success, msg = reserve_stock(cart, hold_owner=username)
+    if not success:
+        raise Exception(msg)
 
-    # Check stock availability for each item in the cart
-    for item in cart:
-        product = next((p for p in products if p["product_id"] == item["product_id"]), None)
-        if not product:
-            raise Exception(f"Product ID {item['product_id']} not found.")
-        if product["stock"] < item["quantity"]:
-            raise Exception(f"Insufficient stock for product {product['name']}")
-
-    # Reduce stock quantity for each product in the cart
-    for item in cart:
-        success, msg = reduce_stock(item['product_id'], item['quantity'])
-        if not success:
-            raise Exception(f"Order failed: {msg}")
-    
     # Calculate total price for the order
     total = sum(item['quantity'] * item['price'] for item in cart)
 
@@ -57,44 +43,36 @@ def create_order(username, cart):
          "total": total 
     }
 
-    # Add order to the list and save
-    orders.append(order)
-    save_orders(orders)
+    # Append to the current month's partition only
+    order_store.append_order(order)
+
+    # Everything else (notifications, rollups, indexes, ...) runs in the background
+    task_queue.publish("order_placed", order)
     return order["order_id"]
 
 def get_orders_for_user(username):
-    # Return list of orders filtered by username
-    orders = load_orders()
+    # Return list of orders filtered by username (canceled ones included);
+    # fresh, so an order just placed through another worker is listed
+    orders = order_store.load_orders(include_canceled=True, fresh=True)
     return [order for order in orders if order["username"] == username]
 
 def cancel_order(order_id):
-    orders = load_orders()
-    updated_orders = []
-    canceled_order = None
-
-    for order in orders:
-        if order['order_id'] == order_id:
-            # If already canceled, return failure message
-            if order.get('status') == 'canceled':
-                return False, "Order already canceled"
+    # Move the order to the canceled tier (kept for reports) and restore stock
+    order, error = order_store.cancel_order(order_id)
+    if not order:
+        return False, error
 
-            # Restore stock for all items in this order
-            for item in order['items']:
-                increase_stock(item['product_id'], item['quantity'])
+    # Restore stock for all items in this order with one write
+    release_stock(order['items'])
 
-            # Mark order status as canceled
-            order['status'] = 'canceled'
-            canceled_order = order  # Keep a reference for UI
-            continue  # Skip adding canceled order to updated_orders (removes it from active orders)
-        
-        # Keep active orders
-        updated_orders.append(order)
+    task_queue.publish("order_canceled", order)
+    return True, order
 
-    # Save updated orders list without the canceled one
-    save_orders(updated_orders)
-    
-    # Return success flag and canceled order info for UI or False with message if not found
-    if canceled_order:
-        return True, canceled_order
-    
-    return False, "Order not found"
\ No newline at end of file
+@task_queue.task("notify_low_stock", on="order_placed")
+def notify_low_stock(order):
+    # Warn about products that an order left at or below the low-stock threshold
+    for item in order["items"]:
+        product = get_product_by_id(item["product_id"])
+        if product and product.stock <= LOW_STOCK_THRESHOLD:
+            logger.warning("Low stock: %s (%s) has %d left",
+                           product.name, product.product_id, product.stock)
\ No newline at end of file
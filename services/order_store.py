@@ -0,0 +1,288 @@
+# services/order_store.py
+#
+# Month-partitioned order storage:
+#   data/orders/YYYY-MM.json                       current and recent orders
+#   data/orders/archive/YYYY-MM.json.gz            archived months (compressed)
+#   data/orders/archive/canceled-YYYY-MM.json.gz   canceled orders of a month
+#
+# Range queries only open the partitions that overlap the range, and the
+# current partition stays small because old months move to the archive.
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+from threading import Lock
+from utils.storage import load_data, save_data
+from utils.id_allocator import locked_file
+from utils.change_feed import change_feed
+
+ORDERS_DIR = "data/orders"
+ARCHIVE_DIR = "data/orders/archive"
+LEGACY_ORDERS_FILE = "data/orders.json"
+# Active partitions older than this many months are moved to the archive
+ARCHIVE_AFTER_MONTHS = 12
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_PARTITION_RE = re.compile(r"^(canceled-)?(\d{4}-\d{2})\.json(\.gz)?$")
+
+# Decompressed archive partitions, keyed by path and reused until the file changes
+_archive_cache = {}
+_archive_cache_lock = Lock()
+
+# Active partitions (as tuples), kept until a write to that month is reported
+_active_cache = {}
+_active_cache_lock = Lock()
+
+
+def _on_orders_changed(resource, order_ids):
+    # Another worker wrote a partition; the gap fallback passes ORDERS_DIR itself
+    with _active_cache_lock:
+        if resource == ORDERS_DIR:
+            _active_cache.clear()
+        else:
+            _active_cache.pop(resource, None)
+
+
+change_feed.subscribe(ORDERS_DIR, _on_orders_changed)
+
+
+def partition_key(date_str):
+    # "2025-06-06 14:42:58" -> "2025-06"
+    return date_str[:7]
+
+
+def _month_key(dt):
+    return dt.strftime("%Y-%m")
+
+
+def _active_path(key):
+    return os.path.join(ORDERS_DIR, f"{key}.json")
+
+
+def _archive_path(key):
+    return os.path.join(ARCHIVE_DIR, f"{key}.json.gz")
+
+
+def _canceled_path(key):
+    return os.path.join(ARCHIVE_DIR, f"canceled-{key}.json.gz")
+
+
+def _load_gz(path):
+    # Read a compressed partition, reusing the decoded copy while it is unchanged
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return []
+    signature = (st.st_mtime_ns, st.st_size)
+    with _archive_cache_lock:
+        cached = _archive_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        orders = json.load(f)
+    with _archive_cache_lock:
+        _archive_cache[path] = (signature, orders)
+    return orders
+
+
+def _load_active(path):
+    # Read an active partition, reusing the cached copy while no write was reported
+    change_feed.poll()
+    with _active_cache_lock:
+        orders = _active_cache.get(path)
+        if orders is None:
+            orders = _active_cache[path] = tuple(load_data(path))
+        return orders
+
+
+def _store_active(path, orders):
+    # Keep this process's cached copy in step with its own writes
+    with _active_cache_lock:
+        if orders is None:
+            _active_cache.pop(path, None)
+        else:
+            _active_cache[path] = tuple(orders)
+
+
+def _save_gz(path, orders):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(orders, f)
+    os.replace(tmp_path, path)
+
+
+def _list_keys(directory, canceled, compressed):
+    # Partition keys of one storage tier
+    keys = set()
+    if not os.path.isdir(directory):
+        return keys
+    for name in os.listdir(directory):
+        match = _PARTITION_RE.match(name)
+        if match and bool(match.group(1)) == canceled and bool(match.group(3)) == compressed:
+            keys.add(match.group(2))
+    return keys
+
+
+def _active_keys():
+    return _list_keys(ORDERS_DIR, canceled=False, compressed=False)
+
+
+def _archived_keys():
+    return _list_keys(ARCHIVE_DIR, canceled=False, compressed=True)
+
+
+def _canceled_keys():
+    return _list_keys(ARCHIVE_DIR, canceled=True, compressed=True)
+
+
+def migrate_legacy_file():
+    # Split a pre-partitioning data/orders.json into monthly partitions (runs once)
+    if not os.path.exists(LEGACY_ORDERS_FILE):
+        return
+    with locked_file(LEGACY_ORDERS_FILE + ".lock"):
+        if not os.path.exists(LEGACY_ORDERS_FILE):
+            return
+        by_month = {}
+        for order in load_data(LEGACY_ORDERS_FILE):
+            by_month.setdefault(partition_key(order["date"]), []).append(order)
+        os.makedirs(ORDERS_DIR, exist_ok=True)
+        for key, orders in by_month.items():
+            active = [o for o in orders if o.get("status") != "canceled"]
+            canceled = [o for o in orders if o.get("status") == "canceled"]
+            if active:
+                save_data(_active_path(key), load_data(_active_path(key)) + active)
+                _store_active(_active_path(key), None)
+            if canceled:
+                _save_gz(_canceled_path(key), _load_gz(_canceled_path(key)) + canceled)
+        os.replace(LEGACY_ORDERS_FILE, LEGACY_ORDERS_FILE + ".migrated")
+
+
+def _in_range(order, start, end):
+    if start is None and end is None:
+        return True
+    try:
+        order_date = datetime.strptime(order["date"], DATE_FORMAT)
+    except (KeyError, ValueError):
+        return False
+    return (start is None or order_date >= start) and (end is None or order_date <= end)
+
+
+def load_orders(start=None, end=None, include_canceled=False, fresh=False):
+    """
+    Return orders placed between start and end (datetimes, inclusive,
+    either may be None), opening only the monthly partitions in range.
+    Canceled orders are only read when include_canceled is set.
+    fresh=True also includes writes made by other workers within the
+    change feed's poll interval (e.g. a customer's just-placed order).
+    """
+    migrate_legacy_file()
+    if fresh:
+        change_feed.poll(force=True)
+    start_key = _month_key(start) if start else None
+    end_key = _month_key(end) if end else None
+
+    def wanted(key):
+        return (start_key is None or key >= start_key) and (end_key is None or key <= end_key)
+
+    sources = [(k, _active_path(k), False) for k in _active_keys() if wanted(k)]
+    sources += [(k, _archive_path(k), True) for k in _archived_keys() if wanted(k)]
+    if include_canceled:
+        sources += [(k, _canceled_path(k), True) for k in _canceled_keys() if wanted(k)]
+
+    orders = []
+    for key, path, compressed in sorted(sources):
+        partition = _load_gz(path) if compressed else _load_active(path)
+        orders.extend(o for o in partition if _in_range(o, start, end))
+    orders.sort(key=lambda o: o.get("date", ""))
+    return orders
+
+
+def append_order(order):
+    # Add a new order to its (current) monthly partition
+    migrate_legacy_file()
+    os.makedirs(ORDERS_DIR, exist_ok=True)
+    path = _active_path(partition_key(order["date"]))
+    with locked_file(path + ".lock"):
+        orders = load_data(path)
+        orders.append(order)
+        save_data(path, orders, changed_keys=[order["order_id"]])
+        _store_active(path, orders)
+
+
+def find_order(order_id):
+    # Look an order up by ID, newest partitions first, archives last
+    order = _find_order(order_id)
+    # A miss may be an order another worker placed since the last (throttled)
+    # feed poll, e.g. the receipt redirect after checkout: poll and look again
+    if order is None:
+        change_feed.poll(force=True)
+        order = _find_order(order_id)
+    return order
+
+
+def _find_order(order_id):
+    migrate_legacy_file()
+    for key in sorted(_active_keys(), reverse=True):
+        order = next((o for o in _load_active(_active_path(key)) if o["order_id"] == order_id), None)
+        if order:
+            return order
+    for keys, path_for in ((_archived_keys(), _archive_path), (_canceled_keys(), _canceled_path)):
+        for key in sorted(keys, reverse=True):
+            order = next((o for o in _load_gz(path_for(key)) if o["order_id"] == order_id), None)
+            if order:
+                return order
+    return None
+
+
+def cancel_order(order_id):
+    """
+    Move an active order to the canceled tier of its month.
+    Returns (order, None) on success or (None, message) on failure.
+    """
+    migrate_legacy_file()
+    for key in sorted(_active_keys(), reverse=True):
+        path = _active_path(key)
+        with locked_file(path + ".lock"):
+            orders = load_data(path)
+            order = next((o for o in orders if o["order_id"] == order_id), None)
+            if not order:
+                continue
+            order["status"] = "canceled"
+            order["canceled_at"] = datetime.now().strftime(DATE_FORMAT)
+            canceled_path = _canceled_path(key)
+            _save_gz(canceled_path, _load_gz(canceled_path) + [order])
+            remaining = [o for o in orders if o["order_id"] != order_id]
+            save_data(path, remaining, changed_keys=[order_id])
+            _store_active(path, remaining)
+            return order, None
+
+    # Orders that are already archived or canceled cannot be canceled here
+    existing = find_order(order_id)
+    if existing and existing.get("status") == "canceled":
+        return None, "Order already canceled"
+    if existing:
+        return None, "Order is archived and can no longer be canceled"
+    return None, "Order not found"
+
+
+def archive_old_partitions(now=None, keep_months=ARCHIVE_AFTER_MONTHS):
+    # Compress active partitions older than keep_months into the archive tier
+    migrate_legacy_file()
+    now = now or datetime.now()
+    month_index = now.year * 12 + now.month - 1 - keep_months
+    cutoff = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+    archived = []
+    for key in sorted(_active_keys()):
+        if key >= cutoff:
+            continue
+        path = _active_path(key)
+        with locked_file(path + ".lock"):
+            orders = load_data(path)
+            _save_gz(_archive_path(key), _load_gz(_archive_path(key)) + orders)
+            os.remove(path)
+            _store_active(path, None)
+        change_feed.publish(path)
+        archived.append(key)
+    return archived
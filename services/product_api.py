@@ -0,0 +1,111 @@
+# services/product_api.py
+import base64
+import binascii
+from bisect import bisect_right
+from threading import Lock
+from services import product_manager
+
+# Fields a client may ask for with ?fields=
+PRODUCT_FIELDS = ("product_id", "name", "price", "stock", "category", "description")
+# Everything except the (long) description unless asked for
+DEFAULT_FIELDS = ("product_id", "name", "price", "stock", "category")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Largest ?ids= batch served in one request
+MAX_BATCH_IDS = 100
+
+
+class ApiError(ValueError):
+    # Bad query parameter; the message is returned to the client
+    pass
+
+
+def parse_fields(raw):
+    # "name,price" -> ("product_id", "name", "price"); product_id is always included
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return ("product_id",) + tuple(f for f in PRODUCT_FIELDS if f in fields and f != "product_id")
+
+
+def parse_ids(raw):
+    ids = list(dict.fromkeys(i.strip() for i in raw.split(",") if i.strip()))
+    if len(ids) > MAX_BATCH_IDS:
+        raise ApiError(f"At most {MAX_BATCH_IDS} ids per request")
+    return ids
+
+
+def parse_limit(raw):
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("limit must be a number")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(product_id):
+    return base64.urlsafe_b64encode(product_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ApiError("Invalid cursor")
+
+
+def project(product, fields):
+    return {field: product.get(field) for field in fields}
+
+
+# Catalog sorted by product ID, rebuilt when the catalog version changes
+_sorted = {"version": None, "products": (), "keys": ()}
+_sorted_lock = Lock()
+
+
+def _sorted_catalog():
+    version = product_manager.get_catalog_version()
+    with _sorted_lock:
+        if _sorted["version"] != version:
+            products = sorted(product_manager.load_catalog(),
+                              key=lambda p: product_manager.product_id_sort_key(p["product_id"]))
+            _sorted["products"] = tuple(products)
+            _sorted["keys"] = tuple(product_manager.product_id_sort_key(p["product_id"])
+                                    for p in products)
+            _sorted["version"] = version
+        return _sorted["products"], _sorted["keys"]
+
+
+def list_page(cursor=None, limit=DEFAULT_PAGE_SIZE, fields=DEFAULT_FIELDS):
+    """
+    One page of products in product ID order, starting after the product
+    named by `cursor`. Cursors stay valid when products are added or
+    removed, unlike page numbers. Returns (products, next_cursor).
+    """
+    products, keys = _sorted_catalog()
+    start = 0
+    if cursor:
+        start = bisect_right(keys, product_manager.product_id_sort_key(decode_cursor(cursor)))
+    page = products[start:start + limit]
+    next_cursor = None
+    if start + limit < len(products):
+        next_cursor = encode_cursor(page[-1]["product_id"])
+    return [project(p, fields) for p in page], next_cursor
+
+
+def get_many(product_ids, fields=DEFAULT_FIELDS):
+    # Batched lookup in request order; returns (products, missing IDs)
+    found, missing = [], []
+    for product_id in product_ids:
+        product = product_manager.get_product_dict(product_id)
+        if product:
+            found.append(project(product, fields))
+        else:
+            missing.append(product_id)
+    return found, missing
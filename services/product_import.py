@@ -0,0 +1,156 @@
+# services/product_import.py
+import csv
+import json
+import math
+from services import product_manager
+
+
+def feed_format(filename):
+    # Work out the feed format from the file extension
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename.lower().endswith(".csv"):
+        return "csv"
+    raise ValueError("Feed must be a .csv or .jsonl file")
+
+
+def iter_feed_rows(stream, fmt):
+    # Yield (line_number, row dict) from a text stream without loading it all
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, {"_error": f"Invalid JSON: {e.msg}"}
+                continue
+            if not isinstance(row, dict):
+                row = {"_error": "Each line must be a JSON object"}
+            yield line_number, row
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_price(value):
+    # JSON true/false would otherwise become 1.0/0.0, and "nan"/"inf" parse as floats
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid price '{value}'")
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid price '{value}'")
+    if not math.isfinite(price):
+        raise ValueError(f"Invalid price '{value}'")
+    if price < 0:
+        raise ValueError("Price cannot be negative")
+    return price
+
+
+def _parse_stock(value):
+    # Whole numbers only: int() would silently truncate 2.7 to 2
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"Invalid stock '{value}' (must be a whole number)")
+    try:
+        stock = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid stock '{value}' (must be a whole number)")
+    if stock < 0:
+        raise ValueError("Stock cannot be negative")
+    return stock
+
+
+def validate_row(row, existing_ids):
+    """
+    Turn a raw feed row into ("upsert", fields) or ("delete", product_id).
+    Raises ValueError with a readable message for invalid rows.
+    """
+    if "_error" in row:
+        raise ValueError(row["_error"])
+
+    action = str(row.get("action") or "upsert").strip().lower()
+    product_id = str(row.get("product_id") or "").strip()
+
+    if action == "delete":
+        if product_id not in existing_ids:
+            raise ValueError(f"Cannot delete unknown product '{product_id}'")
+        return "delete", product_id
+    if action != "upsert":
+        raise ValueError(f"Unknown action '{action}'")
+
+    if product_id and product_id not in existing_ids:
+        raise ValueError(f"Unknown product_id '{product_id}' (leave it blank to add a product)")
+
+    fields = {}
+    if product_id:
+        fields["product_id"] = product_id
+    if not _blank(row.get("name")):
+        fields["name"] = str(row["name"]).strip()
+    if not _blank(row.get("price")):
+        fields["price"] = _parse_price(row["price"])
+    if not _blank(row.get("stock")):
+        fields["stock"] = _parse_stock(row["stock"])
+    for field in ["category", "description"]:
+        if not _blank(row.get(field)):
+            fields[field] = str(row[field]).strip()
+
+    # New products need the same fields as the admin form
+    if not product_id:
+        missing = [f for f in ["name", "price", "stock"] if f not in fields]
+        if missing:
+            raise ValueError(f"Missing required field(s): {', '.join(missing)}")
+    return "upsert", fields
+
+
+def import_feed(stream, fmt, dry_run=False):
+    """
+    Validate a CSV/JSON-lines product feed and apply it in one commit.
+    Nothing is written if any row is invalid or dry_run is set.
+    Returns a summary dict with per-row errors.
+    """
+    existing_ids = set(p["product_id"] for p in product_manager.load_catalog())
+    upserts, deletes, errors = [], [], []
+    seen_ids = {}  # product_id -> line number
+    rows = 0
+
+    for line_number, row in iter_feed_rows(stream, fmt):
+        rows += 1
+        try:
+            action, value = validate_row(row, existing_ids)
+            product_id = value if action == "delete" else value.get("product_id")
+            if product_id:
+                if product_id in seen_ids:
+                    raise ValueError(f"Product '{product_id}' appears more than once")
+                seen_ids[product_id] = line_number
+        except ValueError as e:
+            errors.append({"line": line_number, "error": str(e)})
+            continue
+        if action == "delete":
+            deletes.append(value)
+        else:
+            upserts.append(value)
+
+    summary = {"rows": rows, "errors": errors, "applied": False}
+    if errors or dry_run:
+        summary.update({"to_add": sum(1 for u in upserts if "product_id" not in u),
+                        "to_update": sum(1 for u in upserts if "product_id" in u),
+                        "to_delete": len(deletes)})
+        return summary
+
+    result = product_manager.bulk_apply(upserts, deletes)
+    missing = result.pop("missing")
+    if missing:
+        # Deleted by someone else after validation; bulk_apply wrote nothing
+        summary["errors"] = [{"line": seen_ids[product_id],
+                              "error": f"Product '{product_id}' no longer exists"}
+                             for product_id in missing]
+        return summary
+    summary.update(result)
+    summary["applied"] = True
+    return summary
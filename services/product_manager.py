@@ -1,30 +1,146 @@
 import uuid
+import os
+import hashlib
+from datetime import datetime
+from threading import Lock
 from models.product import Product
 from utils.storage import load_data, save_data
+from utils.id_allocator import BlockIdAllocator
+from utils.change_feed import change_feed
+from services.stock_holds import stock_holds
 import json
 
 PRODUCTS_FILE = "data/products.json"
 TRACKER_FILE = "data/id_tracker.json"
 
-def get_next_product_id():
-    # Read the last product ID from the tracker file
-    with open(TRACKER_FILE, 'r') as f:
-        tracker = json.load(f)
+# Product IDs are reserved from the tracker file in blocks and handed out from memory
+_id_allocator = BlockIdAllocator(TRACKER_FILE, "last_product_id", block_size=50)
+
+# In-memory copy of products.json, reloaded only after the change feed reports a write
+_catalog = {"signature": None, "products": [], "by_id": {}, "versions": {}, "stale": True}
+_catalog_lock = Lock()
+# Callbacks notified with a product ID whenever that product changes or is removed
+_invalidation_listeners = []
+
+def on_product_invalidated(callback):
+    # Register a callback(product_id) for per-product cache invalidation
+    _invalidation_listeners.append(callback)
+    return callback
+
+def _notify_invalidated(product_ids):
+    for product_id in product_ids:
+        for callback in _invalidation_listeners:
+            callback(product_id)
+
+def _file_signature(filepath):
+    # mtime + size identify a version of the file without reading it
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _product_version(product):
+    # Short content hash of a single product record
+    raw = json.dumps(product, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+def _set_catalog(products, signature, versions=None):
+    # Swap in a new catalog and invalidate products whose content changed
+    if versions is None:
+        versions = {p["product_id"]: _product_version(p) for p in products}
+    old_versions = _catalog["versions"]
+    changed = [pid for pid, v in old_versions.items() if versions.get(pid) != v]
+    changed += [pid for pid in versions if pid not in old_versions]
+
+    _catalog["signature"] = signature
+    # Swapped whole, never changed in place. After fork the workers share these
+    # pages only until reading a product updates its refcount and copies the
+    # page; create_app's gc.freeze() only keeps the collector from doing so.
+    _catalog["products"] = tuple(products)
+    _catalog["by_id"] = {p["product_id"]: p for p in products}
+    _catalog["versions"] = versions
+    _catalog["stale"] = False
+    if old_versions:
+        _notify_invalidated(changed)
 
-    # Increment the last product ID and format it as 'P###'
-    tracker['last_product_id'] += 1
-    next_id = f"P{tracker['last_product_id']:03}"
+def _on_products_changed(resource, product_ids):
+    # Another worker wrote products.json: drop the changed products right away
+    # and re-read the file on the next catalog access
+    with _catalog_lock:
+        _catalog["stale"] = True
+    _notify_invalidated(product_ids if product_ids is not None else list(_catalog["versions"]))
 
-    # Save the updated tracker back to file
-    with open(TRACKER_FILE, 'w') as f:
-        json.dump(tracker, f, indent=4)
+change_feed.subscribe(PRODUCTS_FILE, _on_products_changed)
 
-    return next_id
+def load_catalog():
+    # Return the cached product dicts, re-reading the file only if it changed
+    change_feed.poll()
+    with _catalog_lock:
+        if _catalog["stale"]:
+            _set_catalog(load_data(PRODUCTS_FILE), _file_signature(PRODUCTS_FILE))
+        return _catalog["products"]
+
+def _save_products(products):
+    # Write products.json and refresh the cache from memory instead of re-reading it
+    versions = {p["product_id"]: _product_version(p) for p in products}
+    with _catalog_lock:
+        old_versions = None if _catalog["stale"] else _catalog["versions"]
+    changed_ids = None
+    if old_versions is not None:
+        changed_ids = [pid for pid, v in old_versions.items() if versions.get(pid) != v]
+        changed_ids += [pid for pid in versions if pid not in old_versions]
+    save_data(PRODUCTS_FILE, products, changed_keys=changed_ids)
+    with _catalog_lock:
+        _set_catalog(products, _file_signature(PRODUCTS_FILE), versions)
+
+def get_catalog_version():
+    # Opaque string that changes whenever products.json changes
+    load_catalog()
+    signature = _catalog["signature"]
+    if signature is None:
+        return "empty"
+    return f"{signature[0]:x}-{signature[1]:x}"
+
+def get_catalog_last_modified():
+    # Modification time of products.json as a datetime (None if missing)
+    load_catalog()
+    signature = _catalog["signature"]
+    if signature is None:
+        return None
+    return datetime.fromtimestamp(signature[0] / 1e9)
+
+def get_product_version(product_id):
+    # Content hash for a single product, or None if it does not exist
+    load_catalog()
+    return _catalog["versions"].get(product_id)
+
+def format_product_id(number):
+    # Format a numeric ID as 'P###' (grows to P1000, P10000, ... past 999)
+    return f"P{number:03}"
+
+def product_id_sort_key(product_id):
+    # Sort 'P###' IDs numerically so P1000 comes after P999
+    digits = product_id[1:]
+    if digits.isdigit():
+        return (0, int(digits), product_id)
+    return (1, 0, product_id)
+
+def get_next_product_id():
+    # Take the next ID from the in-memory block (no file I/O in the common case)
+    return format_product_id(_id_allocator.next_id())
 
 def list_products():
-    # Load all products from the JSON file and convert to Product objects
-    data = load_data(PRODUCTS_FILE)
-    return [Product.from_dict(p) for p in data]
+    # Convert the cached catalog to Product objects
+    return [Product.from_dict(p) for p in load_catalog()]
+
+def iter_products(ordered=False):
+    # Like list_products(), but builds each Product only when it is reached;
+    # ordered=True yields them in product ID order (P1000 after P999)
+    products = load_catalog()
+    if ordered:
+        products = sorted(products, key=lambda p: product_id_sort_key(p["product_id"]))
+    return (Product.from_dict(p) for p in products)
 
 def add_product(name, price, stock, category, description):
     # Load existing products
@@ -38,7 +154,7 @@ def add_product(name, price, stock, category, description):
 
     # Add new product dict to products list and save
     products.append(new_product.to_dict())
-    save_data(PRODUCTS_FILE, products)
+    _save_products(products)
 
     return new_product
 
@@ -48,18 +164,23 @@ def update_product_stock(product_id, new_stock):
     for product in products:
         if product["product_id"] == product_id:
             product["stock"] = new_stock
-            save_data(PRODUCTS_FILE, products)
+            _save_products(products)
             return True
     return False  # Product not found
 
 def get_product_by_id(product_id):
     # Find and return Product object for given product ID
-    products = load_data(PRODUCTS_FILE)
-    for p in products:
-        if p["product_id"] == product_id:
-            return Product.from_dict(p)
+    load_catalog()
+    p = _catalog["by_id"].get(product_id)
+    if p:
+        return Product.from_dict(p)
     return None  # Not found
 
+def get_product_dict(product_id):
+    # Cached product record (shared, do not modify), or None
+    load_catalog()
+    return _catalog["by_id"].get(product_id)
+
 def list_products_paginated(page=1, per_page=3):
     # Get all products and return a page of products with total count
     all_products = list_products()
@@ -75,7 +196,7 @@ def increase_stock(product_id, quantity):
     for product in products:
         if product['product_id'] == product_id:
             product['stock'] += quantity
-            save_data(PRODUCTS_FILE, products)
+            _save_products(products)
             return True, "Stock increased"
     return False, "Product not found"
 
@@ -87,10 +208,60 @@ def reduce_stock(product_id, quantity):
             if product['stock'] < quantity:
                 return False, "Insufficient stock"
             product['stock'] -= quantity
-            save_data(PRODUCTS_FILE, products)
+            _save_products(products)
             return True, "Stock updated"
     return False, "Product not found"
 
+def get_available_stock(product_id, exclude_owner=None):
+    # Stored stock minus quantities held by other customers at checkout
+    load_catalog()
+    product = _catalog["by_id"].get(product_id)
+    if not product:
+        return 0
+    return max(product["stock"] - stock_holds.held_quantity(product_id, exclude_owner), 0)
+
+def hold_stock(owner, items):
+    # Hold cart quantities for a customer entering checkout (see stock_holds)
+    def stored_stock(product_ids):
+        # Runs with holds locked: pick up sales other workers just wrote
+        change_feed.poll(force=True)
+        load_catalog()
+        return {pid: _catalog["by_id"][pid]["stock"] for pid in product_ids
+                if pid in _catalog["by_id"]}
+    return stock_holds.place(owner, items, stored_stock)
+
+def reserve_stock(items, hold_owner=None):
+    # Validate and reduce stock for several items with a single products.json write
+    # (stock held by other customers is not available; the owner's own hold is).
+    # Runs inside the holds transaction, so no hold can be placed in between.
+    with stock_holds.transaction() as conn:
+        products = load_data(PRODUCTS_FILE)
+        by_id = {p['product_id']: p for p in products}
+        held = stock_holds.held_quantities(set(item['product_id'] for item in items),
+                                           exclude_owner=hold_owner, conn=conn)
+        for item in items:
+            product = by_id.get(item['product_id'])
+            if not product:
+                return False, f"Product ID {item['product_id']} not found."
+            if product['stock'] - held.get(item['product_id'], 0) < item['quantity']:
+                return False, f"Insufficient stock for product {product['name']}"
+        for item in items:
+            by_id[item['product_id']]['stock'] -= item['quantity']
+        _save_products(products)
+        if hold_owner:
+            stock_holds.release(hold_owner, conn=conn)
+    return True, "Stock updated"
+
+def release_stock(items):
+    # Return stock for several items (e.g. a canceled order) with a single write
+    products = load_data(PRODUCTS_FILE)
+    by_id = {p['product_id']: p for p in products}
+    for item in items:
+        if item['product_id'] in by_id:
+            by_id[item['product_id']]['stock'] += item['quantity']
+    _save_products(products)
+    return True, "Stock increased"
+
 def edit_product(product_id, **kwargs):
     # Update specified fields for product with matching ID
     products = load_data(PRODUCTS_FILE)
@@ -99,15 +270,68 @@ def edit_product(product_id, **kwargs):
             for field in ['name', 'price', 'stock', 'category', 'description']:
                 if field in kwargs:
                     product[field] = kwargs[field]
-            save_data(PRODUCTS_FILE, products)
+            _save_products(products)
             return True, "Product updated"
     return False, "Product not found"
 
+def bulk_apply(upserts, deletes):
+    """
+    Apply many product changes with a single products.json write.
+    upserts: dicts with the fields to set; rows without a product_id are added.
+    deletes: product IDs to remove.
+    Returns a summary of what changed. If any product to update or delete
+    no longer exists, nothing is written and summary["missing"] lists them.
+    """
+    products = load_data(PRODUCTS_FILE)
+    by_id = {p["product_id"]: p for p in products}
+    summary = {"added": [], "updated": [], "unchanged": 0, "deleted": [], "missing": []}
+
+    # Products may have been removed since the rows were validated
+    wanted_ids = [row["product_id"] for row in upserts if row.get("product_id")] + list(deletes)
+    summary["missing"] = [pid for pid in wanted_ids if pid not in by_id]
+    if summary["missing"]:
+        return summary
+
+    # Reserve IDs for all new products at once
+    new_rows = [row for row in upserts if not row.get("product_id")]
+    new_ids = iter(_id_allocator.next_ids(len(new_rows))) if new_rows else iter(())
+
+    for row in upserts:
+        product_id = row.get("product_id")
+        if not product_id:
+            new_product = Product(format_product_id(next(new_ids)), row["name"], row["price"],
+                                  row["stock"], row.get("category") or "Uncategorized",
+                                  row.get("description", ""))
+            products.append(new_product.to_dict())
+            by_id[new_product.product_id] = products[-1]
+            summary["added"].append(new_product.product_id)
+            continue
+
+        product = by_id[product_id]
+        changed = False
+        for field in ['name', 'price', 'stock', 'category', 'description']:
+            if field in row and product.get(field) != row[field]:
+                product[field] = row[field]
+                changed = True
+        if changed:
+            summary["updated"].append(product_id)
+        else:
+            summary["unchanged"] += 1
+
+    delete_ids = set(deletes)
+    if delete_ids:
+        products = [p for p in products if p["product_id"] not in delete_ids]
+        summary["deleted"] = sorted(delete_ids, key=product_id_sort_key)
+
+    if summary["added"] or summary["updated"] or summary["deleted"]:
+        _save_products(products)
+    return summary
+
 def remove_product(product_id):
     # Remove product with matching product ID from list and save
     products = load_data(PRODUCTS_FILE)
     updated_products = [p for p in products if p["product_id"] != product_id]
     if len(products) == len(updated_products):
         return False, "Product not found"  # No product removed
-    save_data(PRODUCTS_FILE, updated_products)
+    _save_products(updated_products)
     return True, "Product removed"
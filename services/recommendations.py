@@ -0,0 +1,123 @@
+# services/recommendations.py
+#
+# "Frequently bought together" counts for product pages. Every pair of
+# distinct products in a (non-canceled) order counts once in each
+# direction, so the related products of a product are one indexed query:
+# its pairs ordered by count.
+#
+# Counts live in SQLite: applying an order upserts only its own pairs
+# instead of rewriting the whole index, and the IDs of applied orders are
+# recorded in the same transaction, so a task delivered twice (or an
+# order already covered by the backfill) is never counted twice.
+from datetime import datetime
+from itertools import permutations
+from utils.sqlite import SQLiteDB
+from services.task_queue import task_queue
+from services import order_store
+
+RECOMMENDATIONS_DB = "data/recommendations.db"
+# Related products kept per product
+TOP_N = 4
+
+_db = SQLiteDB(RECOMMENDATIONS_DB, [
+    "CREATE TABLE IF NOT EXISTS pairs ("
+    " product_id TEXT NOT NULL,"
+    " other_id TEXT NOT NULL,"
+    " count INTEGER NOT NULL,"
+    " PRIMARY KEY (product_id, other_id))",
+    "CREATE INDEX IF NOT EXISTS pairs_ranked ON pairs (product_id, count DESC, other_id)",
+    # sign: 1 = counted, -1 = canceled (uncounted, or canceled before it was counted)
+    "CREATE TABLE IF NOT EXISTS applied_orders ("
+    " order_id TEXT PRIMARY KEY,"
+    " sign INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+])
+
+
+def _add_pairs(conn, order, weight):
+    # Count every ordered pair of distinct products in the order (weight -1 removes it)
+    product_ids = sorted(set(item["product_id"] for item in order["items"]))
+    pairs = list(permutations(product_ids, 2))
+    conn.executemany(
+        "INSERT INTO pairs (product_id, other_id, count) VALUES (?, ?, ?)"
+        " ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + excluded.count",
+        [(a, b, weight) for a, b in pairs]
+    )
+    if weight < 0:
+        conn.executemany("DELETE FROM pairs WHERE product_id = ? AND other_id = ? AND count <= 0",
+                         pairs)
+
+
+def _apply(conn, order, weight):
+    # Count a placed (1) or uncount a canceled (-1) order once; False if nothing changed
+    row = conn.execute("SELECT sign FROM applied_orders WHERE order_id = ?",
+                       (order["order_id"],)).fetchone()
+    state = row[0] if row else None
+    if state == -1 or (weight > 0 and state == 1):
+        return False  # Already applied, or canceled before it was counted
+    if weight > 0 or state == 1:
+        _add_pairs(conn, order, weight)
+    conn.execute("INSERT OR REPLACE INTO applied_orders (order_id, sign) VALUES (?, ?)",
+                 (order["order_id"], 1 if weight > 0 else -1))
+    return True
+
+
+def _backfilled(conn):
+    return conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone() is not None
+
+
+def _backfill(conn):
+    # Apply the whole order history (caller holds the write transaction)
+    for order in order_store.load_orders(include_canceled=True, fresh=True):
+        _apply(conn, order, -1 if order.get("status") == "canceled" else 1)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', ?)",
+                 (datetime.now().strftime(order_store.DATE_FORMAT),))
+
+
+def _write(fn):
+    # Run fn(conn) in an exclusive write transaction, backfilling first if needed
+    with _db.transaction() as conn:
+        if not _backfilled(conn):
+            _backfill(conn)
+        return fn(conn) if fn else None
+
+
+def init_index():
+    # Build the counts from the order history on first use
+    if not _backfilled(_db.connection()):
+        _write(None)
+
+
+def related_products(product_id, limit=TOP_N):
+    # Product IDs most often bought together with product_id; product ID breaks ties
+    init_index()
+    rows = _db.execute(
+        "SELECT other_id FROM pairs WHERE product_id = ? ORDER BY count DESC, other_id LIMIT ?",
+        (product_id, limit)
+    ).fetchall()
+    return tuple(row[0] for row in rows)
+
+
+def update_index(order, weight):
+    # Apply one placed (+1) or canceled (-1) order; repeated calls are no-ops
+    return _write(lambda conn: _apply(conn, order, weight))
+
+
+def rebuild_index():
+    # Offline job: rebuild from the full order history; returns the number of products indexed
+    def rebuild(conn):
+        for table in ("pairs", "applied_orders", "meta"):
+            conn.execute(f"DELETE FROM {table}")
+        _backfill(conn)
+        return conn.execute("SELECT COUNT(DISTINCT product_id) FROM pairs").fetchone()[0]
+    return _write(rebuild)
+
+
+@task_queue.task("index_placed_order", on="order_placed")
+def index_placed_order(order):
+    update_index(order, 1)
+
+
+@task_queue.task("unindex_canceled_order", on="order_canceled")
+def unindex_canceled_order(order):
+    update_index(order, -1)
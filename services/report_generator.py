@@ -2,31 +2,62 @@
 import json
 from datetime import datetime
 from collections import defaultdict
+from services.product_manager import product_id_sort_key
+from services import order_store
+
+def calculate_stats(products, orders):
+    # Total units sold and profit per product for the given orders
+    stats = {p["product_id"]: {"sold": 0, "profit": 0.0} for p in products}
+    product_map = {p["product_id"]: p for p in products}
+
+    for order in orders:
+        for item in order["items"]:
+            pid = item["product_id"]
+            qty = item["quantity"]
+            price = item.get("price")
+
+            # If product wasn't initialized in stats, add it (failsafe)
+            if pid not in stats:
+                stats[pid] = {"sold": 0, "profit": 0.0}
+
+            # If price is missing, fall back to product price
+            if price is None and pid in product_map:
+                price = product_map[pid]["price"]
+
+            # Accumulate sales and profit if price is available
+            if price is not None:
+                stats[pid]["sold"] += qty
+                stats[pid]["profit"] += price * qty
+    return stats
 
 class ReportGenerator:
-    def __init__(self, orders_path='data/orders.json', products_path='data/products.json'):
-        # Initialize with file paths for orders and products JSON data
-        self.orders_path = orders_path
+    def __init__(self, products_path='data/products.json'):
+        # Initialize with the products JSON path (orders come from the partitioned store)
         self.products_path = products_path
 
-    def load_orders(self):
-        # Load and return orders data from JSON file
-        with open(self.orders_path, 'r') as f:
-            return json.load(f)
+    def load_orders(self, start=None, end=None, include_canceled=False):
+        # Load orders from only the monthly partitions in the requested range
+        return order_store.load_orders(start, end, include_canceled)
 
     def load_products(self):
         # Load and return products data from JSON file
         with open(self.products_path, 'r') as f:
             return json.load(f)
 
-    def generate_financial_report(self):
+    def generate_financial_report(self, start=None, end=None):
         # Generate financial summary including total revenue and sales grouped by date
+        # (optionally limited to orders between start and end)
         
-        orders = self.load_orders()
+        orders = self.load_orders(start, end, include_canceled=True)
         total_revenue = 0.0
+        canceled_orders = 0
         sales_by_date = defaultdict(float)  # Dictionary to accumulate sales per day
 
         for order in orders:
+            # Canceled orders are counted but bring in no revenue
+            if order.get('status') == 'canceled':
+                canceled_orders += 1
+                continue
             total = order.get('total', 0.0)  # Get order total amount, default 0.0 if missing
             date = order.get('date', 'unknown')[:10]  # Extract date part YYYY-MM-DD from full timestamp string
             total_revenue += total  # Accumulate total revenue
@@ -35,22 +66,27 @@ class ReportGenerator:
         # Return summary data as dictionary
         return {
             "total_revenue": total_revenue,
-            "total_orders": len(orders),
-            "sales_by_date": dict(sales_by_date)  # Convert defaultdict to regular dict
+            "total_orders": len(orders) - canceled_orders,
+            "canceled_orders": canceled_orders,
+            "sales_by_date": dict(sorted(sales_by_date.items()))  # Regular dict in date order
         }
 
-    def generate_stock_report(self):
-        # Generate a stock summary report listing product IDs, names, and current stock
-        
-        products = self.load_products()
-        stock_summary = []
+    def generate_sales_stats(self, start=None):
+        # Units sold and profit per product for orders placed since start (/api/stats)
+        return calculate_stats(self.load_products(), self.load_orders(start))
 
+    def iter_stock_report(self):
+        # Yield stock summary rows (product ID, name, current stock) one at a time,
+        # in numeric ID order so P1000 is listed after P999
+        products = self.load_products()
+        products.sort(key=lambda p: product_id_sort_key(p.get("product_id") or ""))
         for p in products:
-            # Append summary info for each product
-            stock_summary.append({
+            yield {
                 "product_id": p.get("product_id"),
                 "name": p.get("name"),
                 "stock": p.get("stock", 0)  # Default to 0 if no stock info present
-            })
+            }
 
-        return stock_summary
+    def generate_stock_report(self):
+        # Generate a stock summary report listing product IDs, names, and current stock
+        return list(self.iter_stock_report())
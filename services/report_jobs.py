@@ -0,0 +1,231 @@
+# services/report_jobs.py
+#
+# Admin reports run in a small pool of separate processes, so a heavy
+# report over a long order history never occupies the threads (or the
+# GIL) that serve the storefront. Workers only read the data files;
+# save_data replaces files atomically, so every file a report reads is
+# a complete snapshot of that file.
+#
+# Job status and results are kept in a SQLite table, so a job submitted
+# by one web worker can be polled through any other.
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from services.report_generator import ReportGenerator
+from utils.sqlite import SQLiteDB
+
+REPORT_JOBS_DB = "data/report_jobs.db"
+# Worker processes for report jobs, per web worker
+REPORT_WORKERS = int(os.environ.get("AWE_REPORT_WORKERS", 2))
+# How long a page waits for its report before showing a "being prepared" page
+REPORT_TIMEOUT_SECONDS = 5
+# A job still unfinished after this long is given up (e.g. its web worker died)
+MAX_JOB_SECONDS = 600
+# Finished jobs kept for polling
+MAX_FINISHED_JOBS = 100
+
+
+JOBS_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " id TEXT PRIMARY KEY,"
+    " kind TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " submitted REAL NOT NULL,"
+    " started REAL,"
+    " finished REAL,"
+    " result TEXT,"
+    " error TEXT)",
+    "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, finished)",
+]
+
+# Job databases opened by this (pool worker) process, by path
+_worker_dbs = {}
+
+
+def _generate(kind, params):
+    generator = ReportGenerator()
+    if kind == "financial":
+        return generator.generate_financial_report(params.get("start"), params.get("end"))
+    if kind == "sales_stats":
+        return generator.generate_sales_stats(params.get("start"))
+    raise ValueError(f"Unknown report: {kind}")
+
+
+def _run_report(db_path, job_id, kind, params):
+    # Runs in a worker process and records its own progress and result
+    db = _worker_dbs.get(db_path)
+    if db is None:
+        db = _worker_dbs[db_path] = SQLiteDB(db_path, JOBS_SCHEMA)
+    db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+               (time.time(), job_id))
+    try:
+        result = _generate(kind, params)
+    except Exception as e:
+        db.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                   (time.time(), str(e), job_id))
+        raise
+    db.execute("UPDATE jobs SET status = 'done', finished = ?, result = ? WHERE id = ?",
+               (time.time(), json.dumps(result), job_id))
+    return result
+
+
+class ReportPending(Exception):
+    # The report did not finish within the timeout; poll the job instead
+    def __init__(self, job_id):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+
+class ReportJobs:
+    """
+    Report jobs run on a process pool. A caller either waits for the
+    result with a timeout (run) or submits a job and polls it by ID from
+    any worker process. Queue wait and run time are kept per job, and
+    averaged per report kind over the finished jobs that are kept.
+    """
+
+    def __init__(self, db_path=REPORT_JOBS_DB, workers=REPORT_WORKERS,
+                 max_finished=MAX_FINISHED_JOBS, max_job_seconds=MAX_JOB_SECONDS):
+        self.db_path = db_path
+        self.db = SQLiteDB(db_path, JOBS_SCHEMA)
+        self.workers = workers
+        self.max_finished = max_finished
+        self.max_job_seconds = max_job_seconds
+        self.executor = None
+        self.lock = threading.Lock()
+        self.futures = {}              # job_id -> Future while not finished (this process)
+        self.timed_out = 0
+        # Pool processes belong to the process that started them
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.executor = None
+        self.lock = threading.Lock()
+        self.futures = {}
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn: the web worker is multi-threaded, so forking it is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.executor
+
+    def _submit(self, kind, params):
+        job_id = uuid.uuid4().hex
+        executor = self._get_executor()
+        # Record the job first, so the worker and the done callback always find it
+        self.db.execute("INSERT INTO jobs (id, kind, status, submitted) VALUES (?, ?, 'pending', ?)",
+                        (job_id, kind, time.time()))
+        try:
+            future = executor.submit(_run_report, self.db_path, job_id, kind, params)
+        except BrokenProcessPool as e:
+            with self.lock:
+                self.executor = None
+            self._mark_failed(job_id, str(e))
+            raise
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id, future
+
+    def submit(self, kind, **params):
+        # Queue a report and return its job ID for polling
+        return self._submit(kind, params)[0]
+
+    def _mark_failed(self, job_id, error):
+        # For failures the worker could not record itself (e.g. it died)
+        self.db.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ?"
+                        " WHERE id = ? AND status IN ('pending', 'running')",
+                        (time.time(), error, job_id))
+
+    def _finished(self, job_id, future):
+        with self.lock:
+            self.futures.pop(job_id, None)
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            with self.lock:
+                self.executor = None  # A worker died; start a fresh pool next time
+        if error is not None:
+            self._mark_failed(job_id, str(error))
+        self._trim()
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond max_finished
+        self.db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND id NOT IN ("
+            " SELECT id FROM jobs WHERE status IN ('done', 'failed')"
+            " ORDER BY finished DESC LIMIT ?)",
+            (self.max_finished,)
+        )
+
+    def get(self, job_id):
+        # Job dict (with its result once done), or None if unknown or trimmed
+        # Give up on jobs whose web worker or pool process went away
+        self.db.execute("UPDATE jobs SET status = 'failed', finished = ?, error = 'Report job expired'"
+                        " WHERE id = ? AND status IN ('pending', 'running') AND submitted < ?",
+                        (time.time(), job_id, time.time() - self.max_job_seconds))
+        row = self.db.execute(
+            "SELECT id, kind, status, submitted, started, finished, result, error"
+            " FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, submitted, started, finished, result, error = row
+        return {
+            "id": job_id, "kind": kind, "status": status, "submitted": submitted,
+            "queue_ms": round(max(started - submitted, 0) * 1000, 1) if started else None,
+            "run_ms": round((finished - started) * 1000, 1) if started and finished else None,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+        }
+
+    def run(self, kind, timeout=REPORT_TIMEOUT_SECONDS, **params):
+        # Submit and wait up to `timeout` seconds; raises ReportPending after that
+        job_id, future = self._submit(kind, params)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            with self.lock:
+                self.timed_out += 1
+            raise ReportPending(job_id)
+
+    def queue_depth(self):
+        # Jobs submitted but not yet finished (queued or running), across all workers
+        return self.db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()[0]
+
+    def summary(self):
+        # Job counts, queue depth and average queue/run times per report kind
+        counts = dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        rows = self.db.execute(
+            "SELECT kind, COUNT(*), AVG(started - submitted), AVG(finished - started),"
+            " MAX(finished - started) FROM jobs WHERE status = 'done' GROUP BY kind"
+        ).fetchall()
+        kinds = {
+            kind: {"samples": n, "avg_queue_ms": round(max(q, 0) * 1000, 1),
+                   "avg_run_ms": round(r * 1000, 1), "max_run_ms": round(m * 1000, 1)}
+            for kind, n, q, r, m in rows
+        }
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "timed_out": self.timed_out,
+            "queue_depth": counts.get("pending", 0) + counts.get("running", 0),
+            "workers": self.workers,
+            "kinds": kinds,
+        }
+
+
+# Shared report pool for the admin pages and /api/stats
+report_jobs = ReportJobs()
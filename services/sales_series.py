@@ -0,0 +1,239 @@
+# services/sales_series.py
+#
+# Hourly sales buckets for the admin sales chart. Every placed order adds
+# its total to the bucket of its hour and every cancellation removes it,
+# so a chart query only reads the buckets in its range (never the orders)
+# and rolls them up to hours, days, weeks or months.
+#
+# Buckets live in SQLite: applying an order is a one-row upsert instead of
+# rewriting a file, and the IDs of applied orders are recorded in the same
+# transaction, so a task delivered twice (or an order already covered by
+# the backfill) is never counted twice.
+from datetime import datetime, timedelta
+from services.task_queue import task_queue
+from services import order_store
+from utils.sqlite import SQLiteDB
+
+SALES_DB = "data/sales_series.db"
+RESOLUTIONS = ("hour", "day", "week", "month")
+# Longest range (in days) served at each resolution when none is requested
+AUTO_RESOLUTION_DAYS = [(2, "hour"), (90, "day"), (730, "week")]
+# Buckets a single query may produce before downsampling
+MAX_BUCKETS = 20000
+DEFAULT_POINTS = 200
+
+_HOUR_FORMAT = "%Y-%m-%dT%H"
+
+
+def hour_key(date_str):
+    # "2025-06-06 14:42:58" -> "2025-06-06T14"
+    return f"{date_str[:10]}T{date_str[11:13]}"
+
+
+_db = SQLiteDB(SALES_DB, [
+    "CREATE TABLE IF NOT EXISTS sales_hours ("
+    " hour TEXT PRIMARY KEY,"
+    " revenue REAL NOT NULL,"
+    " orders INTEGER NOT NULL)",
+    # sign: 1 = counted, -1 = canceled (uncounted, or canceled before it was counted)
+    "CREATE TABLE IF NOT EXISTS applied_orders ("
+    " order_id TEXT PRIMARY KEY,"
+    " sign INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+])
+
+
+def _add_to_hour(conn, order, sign):
+    key = hour_key(order["date"])
+    conn.execute(
+        "INSERT INTO sales_hours (hour, revenue, orders) VALUES (?, ?, ?)"
+        " ON CONFLICT (hour) DO UPDATE SET revenue = ROUND(revenue + excluded.revenue, 2),"
+        " orders = orders + excluded.orders",
+        (key, round(sign * order.get("total", 0.0), 2), sign)
+    )
+    conn.execute("DELETE FROM sales_hours WHERE hour = ? AND orders <= 0", (key,))
+
+
+def _apply(conn, order, sign):
+    # Count a placed (1) or uncount a canceled (-1) order once; False if nothing changed
+    row = conn.execute("SELECT sign FROM applied_orders WHERE order_id = ?",
+                       (order["order_id"],)).fetchone()
+    state = row[0] if row else None
+    if state == -1 or (sign > 0 and state == 1):
+        return False  # Already applied, or canceled before it was counted
+    if sign > 0 or state == 1:
+        _add_to_hour(conn, order, sign)
+    conn.execute("INSERT OR REPLACE INTO applied_orders (order_id, sign) VALUES (?, ?)",
+                 (order["order_id"], 1 if sign > 0 else -1))
+    return True
+
+
+def _backfilled(conn):
+    return conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone() is not None
+
+
+def _backfill(conn):
+    # Apply the whole order history (caller holds the write transaction)
+    for order in order_store.load_orders(include_canceled=True, fresh=True):
+        _apply(conn, order, -1 if order.get("status") == "canceled" else 1)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', ?)",
+                 (datetime.now().strftime(order_store.DATE_FORMAT),))
+
+
+def _write(fn):
+    # Run fn(conn) in an exclusive write transaction, backfilling first if needed
+    with _db.transaction() as conn:
+        if not _backfilled(conn):
+            _backfill(conn)
+        return fn(conn) if fn else None
+
+
+def init_buckets():
+    # Backfill the buckets from the order history on first use
+    if not _backfilled(_db.connection()):
+        _write(None)
+
+
+def rebuild_buckets():
+    # Rebuild from the full order history (after data repairs); returns the hour count
+    def rebuild(conn):
+        for table in ("sales_hours", "applied_orders", "meta"):
+            conn.execute(f"DELETE FROM {table}")
+        _backfill(conn)
+        return conn.execute("SELECT COUNT(*) FROM sales_hours").fetchone()[0]
+    return _write(rebuild)
+
+
+def update_buckets(order, sign):
+    # Apply one placed (+1) or canceled (-1) order; repeated calls are no-ops
+    return _write(lambda conn: _apply(conn, order, sign))
+
+
+@task_queue.task("bucket_placed_order", on="order_placed")
+def bucket_placed_order(order):
+    update_buckets(order, 1)
+
+
+@task_queue.task("unbucket_canceled_order", on="order_canceled")
+def unbucket_canceled_order(order):
+    update_buckets(order, -1)
+
+
+def _period_start(dt, resolution):
+    if resolution == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())  # Weeks start on Monday
+    return day.replace(day=1)
+
+
+def _next_period(dt, resolution):
+    if resolution == "hour":
+        return dt + timedelta(hours=1)
+    if resolution == "day":
+        return dt + timedelta(days=1)
+    if resolution == "week":
+        return dt + timedelta(weeks=1)
+    return (dt.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _label(dt, resolution):
+    if resolution == "hour":
+        return dt.strftime("%Y-%m-%d %H:00")
+    if resolution == "month":
+        return dt.strftime("%Y-%m")
+    return dt.strftime("%Y-%m-%d")
+
+
+def choose_resolution(start, end):
+    days = (end - start).total_seconds() / 86400
+    for max_days, resolution in AUTO_RESOLUTION_DAYS:
+        if days <= max_days:
+            return resolution
+    return "month"
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y, ...) tuples to
+    `threshold` points. The first and last points are kept, and from each
+    bucket the point forming the largest triangle with its neighbours is
+    chosen, which keeps peaks and dips that plain averaging would flatten.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        ax, ay = points[a][0], points[a][1]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def sales_series(start=None, end=None, resolution=None, points=DEFAULT_POINTS):
+    """
+    Sales between start and end (datetimes; default: first sale to now)
+    rolled up to `resolution` (chosen from the range if None), with empty
+    periods filled with zeros and LTTB-downsampled to at most `points`.
+    Raises ValueError for an invalid resolution or too many buckets.
+    """
+    init_buckets()
+    end = end or datetime.now()
+    if start is None:
+        first = _db.execute("SELECT MIN(hour) FROM sales_hours").fetchone()[0]
+        start = datetime.strptime(first, _HOUR_FORMAT) if first else end
+    if resolution is None:
+        resolution = choose_resolution(start, end)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    rows = _db.execute(
+        "SELECT hour, revenue, orders FROM sales_hours WHERE hour BETWEEN ? AND ? ORDER BY hour",
+        (start.strftime(_HOUR_FORMAT), end.strftime(_HOUR_FORMAT))
+    ).fetchall()
+
+    totals = {}
+    for key, revenue, orders in rows:
+        period = _period_start(datetime.strptime(key, _HOUR_FORMAT), resolution)
+        total = totals.setdefault(period, [0.0, 0])
+        total[0] += revenue
+        total[1] += orders
+
+    # One entry per period, zeros included, so gaps show up on the chart
+    series = []
+    period = _period_start(start, resolution)
+    while period <= end:
+        if len(series) >= MAX_BUCKETS:
+            raise ValueError("Range too long for this resolution")
+        revenue, orders = totals.get(period, (0.0, 0))
+        series.append((period.timestamp(), round(revenue, 2), orders, period))
+        period = _next_period(period, resolution)
+
+    sampled = lttb(series, points)
+    return {
+        "resolution": resolution,
+        "start": _label(_period_start(start, resolution), resolution),
+        "end": _label(_period_start(end, resolution), resolution),
+        "buckets": len(series),
+        "downsampled": len(sampled) < len(series),
+        "points": [{"t": _label(p[3], resolution), "revenue": p[1], "orders": p[2]}
+                   for p in sampled],
+    }
@@ -0,0 +1,143 @@
+# services/stock_holds.py
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from utils.sqlite import SQLiteDB
+
+HOLDS_DB = "data/stock_holds.db"
+# How long stock stays held for a customer on the checkout page
+HOLD_TTL_SECONDS = 600
+# How often expired holds are swept in bulk
+RECLAIM_INTERVAL_SECONDS = 1.0
+
+
+class StockHolds:
+    """
+    Short-lived stock holds keyed by hold owner (the customer's username),
+    shared by all worker processes. Each held product is a row with an
+    expiry time in a SQLite table next to products.json, so a hold placed
+    by one worker is counted and released by every other. Expired rows
+    are ignored by availability queries and deleted in bulk by a periodic
+    sweep instead of being checked on each request.
+    Placing a hold and converting it into a sale (reserve_stock) run in
+    one write transaction, so concurrent checkouts are serialized.
+    """
+
+    def __init__(self, db_path=HOLDS_DB, ttl_seconds=HOLD_TTL_SECONDS,
+                 reclaim_interval=RECLAIM_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.db = SQLiteDB(db_path, [
+            "CREATE TABLE IF NOT EXISTS holds ("
+            " owner TEXT NOT NULL,"
+            " product_id TEXT NOT NULL,"
+            " quantity INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, product_id))",
+            "CREATE INDEX IF NOT EXISTS holds_product ON holds (product_id, expires_at)",
+            "CREATE INDEX IF NOT EXISTS holds_expiry ON holds (expires_at)",
+        ])
+        self.ttl_seconds = ttl_seconds
+        self.reclaim_interval = reclaim_interval
+        self.lock = threading.Lock()
+        self.sweeper = None
+        self.stats = {"placed": 0, "released": 0, "expired": 0}
+        # The sweeper thread does not survive fork
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        self.sweeper = None
+
+    def transaction(self):
+        # Exclusive write transaction across all processes; yields the connection
+        return self.db.transaction()
+
+    def held_quantities(self, product_ids, exclude_owner=None, conn=None):
+        # {product_id: quantity held by everyone except exclude_owner} for unexpired holds
+        conn = conn or self.db.connection()
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        marks = ", ".join("?" * len(product_ids))
+        rows = conn.execute(
+            f"SELECT product_id, SUM(quantity) FROM holds WHERE product_id IN ({marks})"
+            " AND expires_at > ? AND owner != ? GROUP BY product_id",
+            (*product_ids, time.time(), exclude_owner or "")
+        ).fetchall()
+        return dict(rows)
+
+    def held_quantity(self, product_id, exclude_owner=None, conn=None):
+        # Quantity of a product held by everyone except exclude_owner
+        return self.held_quantities([product_id], exclude_owner, conn).get(product_id, 0)
+
+    def place(self, owner, items, load_stock):
+        """
+        Hold the quantities in `items` for `owner`, replacing any earlier hold.
+        load_stock(product_ids) returns {product_id: stored stock}; it is
+        called inside the transaction, so it must read the latest stock.
+        Returns (True, []) or (False, [(product_id, available), ...]).
+        """
+        wanted = defaultdict(int)
+        for item in items:
+            wanted[item["product_id"]] += item["quantity"]
+
+        with self.transaction() as conn:
+            stock = load_stock(list(wanted))
+            held = self.held_quantities(wanted, exclude_owner=owner, conn=conn)
+            shortages = []
+            for product_id, quantity in wanted.items():
+                available = (stock.get(product_id) or 0) - held.get(product_id, 0)
+                if quantity > available:
+                    shortages.append((product_id, max(available, 0)))
+            if shortages:
+                return False, shortages
+
+            expires_at = time.time() + self.ttl_seconds
+            conn.execute("DELETE FROM holds WHERE owner = ?", (owner,))
+            conn.executemany(
+                "INSERT INTO holds (owner, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)",
+                [(owner, product_id, quantity, expires_at) for product_id, quantity in wanted.items()]
+            )
+        self.stats["placed"] += 1
+        self.start()
+        return True, []
+
+    def release(self, owner, conn=None):
+        # Drop the owner's hold (order placed, cart changed, ...)
+        conn = conn or self.db.connection()
+        if conn.execute("DELETE FROM holds WHERE owner = ?", (owner,)).rowcount:
+            self.stats["released"] += 1
+
+    def reclaim_expired(self, now=None):
+        # Delete every hold whose TTL has passed; returns how many rows were removed
+        now = time.time() if now is None else now
+        released = self.db.execute(
+            "DELETE FROM holds WHERE expires_at <= ?", (now,)
+        ).rowcount
+        self.stats["expired"] += released
+        return released
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.reclaim_interval)
+            try:
+                self.reclaim_expired()
+            except sqlite3.Error:
+                pass  # Busy database: the next sweep removes them
+
+    def start(self):
+        # Start the background sweeper thread (once per process)
+        if self.sweeper is not None and self.sweeper.is_alive():
+            return
+        with self.lock:
+            if self.sweeper is None or not self.sweeper.is_alive():
+                self.sweeper = threading.Thread(target=self._sweep_loop,
+                                                name="stock-hold-sweeper", daemon=True)
+                self.sweeper.start()
+
+
+# Shared holds used by the product manager and checkout
+stock_holds = StockHolds()
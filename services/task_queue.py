@@ -0,0 +1,199 @@
+# services/task_queue.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.change_feed import change_feed
+from utils.sqlite import SQLiteDB
+
+TASK_DB = "data/task_queue.db"
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """
+    Durable local task queue for work that can run after a response is sent.
+    Tasks are stored in SQLite so they survive restarts and can be picked
+    up by any worker process; an in-process thread pool executes them with
+    retries and exponential backoff.
+    Delivery is at-least-once: a task whose lease expires (slow handler,
+    crashed worker) is claimed again, so handlers must be idempotent,
+    e.g. by remembering which order IDs they have already applied.
+    """
+
+    def __init__(self, db_path=TASK_DB, workers=2, max_pending=1000,
+                 max_attempts=5, lease_seconds=60):
+        self.db_path = db_path
+        self.db = SQLiteDB(db_path, [
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " name TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " run_after REAL NOT NULL,"
+            " lease_until REAL,"
+            " last_error TEXT,"
+            " created REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS tasks_due ON tasks (status, run_after)",
+        ])
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.handlers = {}       # task name -> callable(payload)
+        self.subscribers = {}    # event name -> [task names]
+        self.wakeup = threading.Event()
+        self.slots = threading.Semaphore(workers)
+        self.executor = None
+        self.dispatcher = None
+        self.start_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0, "inline": 0}
+
+    def task(self, name, on=None):
+        # Decorator registering a task handler, optionally subscribed to an event
+        def decorator(fn):
+            self.handlers[name] = fn
+            if on:
+                self.subscribers.setdefault(on, []).append(name)
+            return fn
+        return decorator
+
+    def pending_count(self):
+        return self.db.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'running')"
+        ).fetchone()[0]
+
+    def enqueue(self, name, payload):
+        """
+        Persist a task for background execution.
+        When the queue is over max_pending (or cannot be written) the task
+        runs inline instead, so producers slow down rather than the backlog
+        growing unbounded. Never raises: callers publish after their own
+        write has been committed, so a failed task must not fail them.
+        """
+        try:
+            if self.pending_count() >= self.max_pending:
+                self.stats["inline"] += 1
+                self._run_inline(name, payload)
+                return None
+
+            now = time.time()
+            task_id = self.db.execute(
+                "INSERT INTO tasks (name, payload, run_after, created) VALUES (?, ?, ?, ?)",
+                (name, json.dumps(payload), now, now)
+            ).lastrowid
+        except sqlite3.Error as e:
+            logger.error("Could not queue task %s, running it inline: %s", name, e)
+            self.stats["inline"] += 1
+            self._run_inline(name, payload)
+            return None
+        self.stats["enqueued"] += 1
+        self.start()
+        self.wakeup.set()
+        return task_id
+
+    def publish(self, event, payload):
+        # Enqueue one task per handler subscribed to the event (never raises)
+        return [self.enqueue(name, payload) for name in self.subscribers.get(event, [])]
+
+    def _run(self, name, payload):
+        handler = self.handlers.get(name)
+        if handler is None:
+            raise LookupError(f"No handler registered for task '{name}'")
+        handler(payload)
+
+    def _run_inline(self, name, payload):
+        # Run a task in the caller's thread; failures are logged, not raised
+        try:
+            self._run(name, payload)
+        except Exception:
+            logger.exception("Inline task %s failed", name)
+            self.stats["failed"] += 1
+
+    def _claim_due(self, limit):
+        # Atomically lease up to `limit` due tasks (expired leases are reclaimed)
+        with self.db.transaction() as conn:
+            now = time.time()
+            rows = conn.execute(
+                "SELECT id, name, payload, attempts FROM tasks"
+                " WHERE (status = 'pending' AND run_after <= ?)"
+                " OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY run_after LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'running', lease_until = ? WHERE id = ?",
+                [(now + self.lease_seconds, row[0]) for row in rows]
+            )
+        return rows
+
+    def _execute(self, task_id, name, payload, attempts):
+        try:
+            try:
+                # Tasks often follow another worker's write; see it before running
+                change_feed.poll(force=True)
+                self._run(name, json.loads(payload))
+            except Exception as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logger.error("Task %s (%s) failed permanently: %s", task_id, name, e)
+                    self.stats["failed"] += 1
+                    status, run_after = "failed", time.time()
+                else:
+                    # Exponential backoff: 2, 4, 8, ... seconds
+                    self.stats["retried"] += 1
+                    status, run_after = "pending", time.time() + 2 ** attempts
+                self.db.execute(
+                    "UPDATE tasks SET status = ?, attempts = ?, run_after = ?,"
+                    " lease_until = NULL, last_error = ? WHERE id = ?",
+                    (status, attempts, run_after, str(e), task_id)
+                )
+            else:
+                self.stats["completed"] += 1
+                self.db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        finally:
+            self.slots.release()
+
+    def _dispatch_loop(self):
+        while True:
+            self.wakeup.wait(timeout=1.0)
+            self.wakeup.clear()
+            # Claim one task per free worker so leases are never held while queued
+            while True:
+                self.slots.acquire()
+                try:
+                    rows = self._claim_due(1)
+                except sqlite3.Error as e:
+                    logger.warning("Task queue dispatch failed: %s", e)
+                    rows = []
+                if not rows:
+                    self.slots.release()
+                    break
+                self.executor.submit(self._execute, *rows[0])
+
+    def start(self):
+        # Start the dispatcher thread and worker pool (once per process)
+        if self.dispatcher is not None and self.dispatcher.is_alive():
+            return
+        with self.start_lock:
+            if self.dispatcher is not None and self.dispatcher.is_alive():
+                return
+            self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                               thread_name_prefix="task-worker")
+            self.dispatcher = threading.Thread(target=self._dispatch_loop,
+                                               name="task-dispatcher", daemon=True)
+            self.dispatcher.start()
+
+    def failed_tasks(self):
+        # Tasks that exhausted their retries, for inspection
+        return self.db.execute(
+            "SELECT id, name, payload, attempts, last_error FROM tasks WHERE status = 'failed'"
+        ).fetchall()
+
+
+# Shared queue used by the services
+task_queue = TaskQueue()
@@ -1,9 +1,28 @@
 from models.user import User
 from utils.storage import load_data, save_data
+from utils.change_feed import change_feed
 from werkzeug.security import generate_password_hash
+from threading import Lock
 
 import json
 
+USERS_FILE = "data/users.json"
+
+# User records looked up by username; entries are dropped when the change feed
+# reports that another worker wrote them
+_user_cache = {}
+_user_cache_lock = Lock()
+
+def _on_users_changed(resource, usernames):
+    with _user_cache_lock:
+        if usernames is None:
+            _user_cache.clear()
+        else:
+            for username in usernames:
+                _user_cache.pop(username, None)
+
+change_feed.subscribe(USERS_FILE, _on_users_changed)
+
 def register_user(username, password, role="customer"):
     # Load existing users from JSON file
     users = load_data("data/users.json")
@@ -20,25 +39,42 @@ def register_user(username, password, role="customer"):
     
     # Append new user data to users list and save back to file
     users.append(new_user.to_dict())
-    save_data("data/users.json", users)
+    save_data("data/users.json", users, changed_keys=[username])
     
     return True, "Registration successful."
 
 def get_user_by_username(username):
-    # Open users JSON file and load data
-    with open('data/users.json') as f:
-        users = json.load(f)
-    
-    # Find user dictionary matching the given username
-    user_data = next((u for u in users if u["username"] == username), None)
-    
-    # If found, return User instance constructed from dictionary
+    # Serve the user from the cache unless another worker has changed it
+    change_feed.poll()
+    with _user_cache_lock:
+        user_data = _user_cache.get(username)
+
+        if user_data is None:
+            # Open users JSON file and load data (under the lock, so an
+            # invalidation cannot slip in between the read and the store)
+            with open('data/users.json') as f:
+                users = json.load(f)
+
+            # Find user dictionary matching the given username
+            user_data = next((u for u in users if u["username"] == username), None)
+            if user_data:
+                _user_cache[username] = user_data
+
+    # If found, return User instance constructed from a copy of the dictionary
     if user_data:
-        return User(**user_data)
+        return User(**dict(user_data))
     
     # Return None if user not found
     return None
 
+def warm_user_cache():
+    # Load every user into the cache (done once at startup, before workers fork)
+    change_feed.poll()
+    with _user_cache_lock:
+        for user_data in load_data(USERS_FILE):
+            _user_cache[user_data["username"]] = user_data
+        return len(_user_cache)
+
 def update_user(username, updated_fields):
     # Load all users from JSON file
     users = load_data("data/users.json")
@@ -58,6 +94,8 @@ def update_user(username, updated_fields):
     if not user_found:
         return False, "User not found."
 
-    # Save updated users list back to JSON file
-    save_data("data/users.json", users)
+    # Save updated users list back to JSON file and drop the cached copy
+    save_data("data/users.json", users, changed_keys=[username])
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
     return True, "User profile updated successfully."
@@ -0,0 +1,167 @@
+# utils/assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from datetime import datetime
+
+from flask import request, send_from_directory
+from jinja2 import FileSystemBytecodeCache
+
+try:
+    import brotli  # Optional: only needed for .br variants
+except ImportError:
+    brotli = None
+
+# Fingerprinted files are written here, relative to the static folder
+DIST_SUBDIR = "dist"
+MANIFEST_NAME = "manifest.json"
+# Fingerprinted URLs never change content, so they can be cached for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Precompressed variants in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def minify_css(css):
+    # Strip comments and redundant whitespace from a stylesheet
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def build_assets(static_dir):
+    """
+    Minify and content-hash every CSS/JS file in static_dir.
+    Writes name.<hash>.ext plus .gz (and .br if brotli is installed)
+    into static/dist and returns the manifest mapping original names
+    to fingerprinted paths.
+    """
+    dist_dir = os.path.join(static_dir, DIST_SUBDIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+
+    for name in sorted(os.listdir(static_dir)):
+        src = os.path.join(static_dir, name)
+        base, ext = os.path.splitext(name)
+        if not os.path.isfile(src) or ext not in (".css", ".js"):
+            continue
+
+        with open(src, "r", encoding="utf-8") as f:
+            content = f.read()
+        if ext == ".css":
+            content = minify_css(content)
+        data = content.encode("utf-8")
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        out_name = f"{base}.{digest}{ext}"
+        out_path = os.path.join(dist_dir, out_name)
+        with open(out_path, "wb") as f:
+            f.write(data)
+        with open(out_path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(out_path + ".br", "wb") as f:
+                f.write(brotli.compress(data))
+
+        manifest[name] = f"{DIST_SUBDIR}/{out_name}"
+
+    # Remove fingerprinted files from previous builds
+    current = set(os.path.basename(p) for p in manifest.values())
+    for name in os.listdir(dist_dir):
+        if name == MANIFEST_NAME:
+            continue
+        original = name
+        for _, suffix in ENCODINGS:
+            if original.endswith(suffix):
+                original = original[:-len(suffix)]
+        if original not in current:
+            os.remove(os.path.join(dist_dir, name))
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def load_manifest(static_dir):
+    # Return the asset manifest, or an empty dict if assets were never built
+    path = os.path.join(static_dir, DIST_SUBDIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def manifest_version(manifest):
+    # Short hash that changes with every build that changes any asset
+    raw = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+def manifest_built_at(static_dir):
+    # Time of the last asset build as a datetime (None if never built)
+    path = os.path.join(static_dir, DIST_SUBDIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    return datetime.fromtimestamp(os.stat(path).st_mtime_ns // 1_000_000_000)
+
+
+def precompile_templates(app, cache_dir):
+    # Compile every template once and keep the bytecode on disk for later workers
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+def init_assets(app):
+    """
+    Rewrite url_for('static', ...) to fingerprinted files from the
+    manifest and serve those with immutable cache headers, preferring
+    precompressed variants the client accepts.
+    Pages that link assets add asset_version to their ETags, so a cached
+    page never points at files a later build has removed.
+    """
+    manifest = load_manifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+    app.extensions["asset_version"] = manifest_version(manifest)
+    app.extensions["assets_built_at"] = manifest_built_at(app.static_folder)
+    static_view = app.view_functions["static"]
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def serve_static(filename):
+        if not filename.startswith(DIST_SUBDIR + "/"):
+            return static_view(filename=filename)
+
+        # Pick the best precompressed file the client accepts
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding, suffix = None, ""
+        for candidate, candidate_suffix in ENCODINGS:
+            path = os.path.join(app.static_folder, filename + candidate_suffix)
+            if request.accept_encodings[candidate] and os.path.exists(path):
+                encoding, suffix = candidate, candidate_suffix
+                break
+
+        response = send_from_directory(
+            app.static_folder, filename + suffix,
+            mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = serve_static
+    return manifest
@@ -0,0 +1,139 @@
+# utils/change_feed.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from utils.sqlite import SQLiteDB
+
+CHANGE_FEED_DB = "data/change_feed.db"
+# Minimum time between two polls of the feed in one process
+POLL_INTERVAL_SECONDS = 0.2
+# Number of recent changes kept in the feed
+MAX_FEED_ROWS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """
+    Local change notifications shared by all worker processes.
+    Every data write appends (resource, key) rows to a SQLite table with
+    a monotonic sequence number. Each process remembers the last sequence
+    it has seen and, when polled, passes only the newer changes to the
+    callbacks subscribed to that resource, so caches can drop exactly the
+    affected entries.
+    """
+
+    def __init__(self, db_path=CHANGE_FEED_DB, poll_interval=POLL_INTERVAL_SECONDS,
+                 max_rows=MAX_FEED_ROWS):
+        self.db_path = db_path
+        self.db = SQLiteDB(db_path, [
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " resource TEXT NOT NULL,"
+            " key TEXT,"
+            " origin INTEGER NOT NULL,"
+            " created REAL NOT NULL)"
+        ])
+        self.poll_interval = poll_interval
+        self.max_rows = max_rows
+        self.subscribers = []      # (resource prefix, callback(resource, keys))
+        self.last_seq = None       # None until the first poll in this process
+        self.last_poll = 0.0
+        self.poll_lock = threading.Lock()
+        self.writes = 0
+        # A forked worker starts from the parent's position (the db opens fresh connections)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.poll_lock = threading.Lock()
+
+    def subscribe(self, resource_prefix, callback):
+        # callback(resource, keys) is called for changes to matching resources;
+        # keys is None when the whole resource changed
+        self.subscribers.append((resource_prefix, callback))
+        return callback
+
+    def publish(self, resource, keys=None):
+        # Record that `resource` (a data file path) changed, optionally only `keys`
+        # (an empty list means the write changed nothing other workers cache)
+        if keys is not None and not keys:
+            return
+        now = time.time()
+        rows = [(resource, str(key), os.getpid(), now) for key in keys] if keys else \
+            [(resource, None, os.getpid(), now)]
+        try:
+            # One transaction, so pollers see all keys of a write together
+            with self.db.transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO changes (resource, key, origin, created) VALUES (?, ?, ?, ?)", rows
+                )
+            self.writes += 1
+            if self.writes % 500 == 0:
+                self.prune()
+        except sqlite3.Error as e:
+            logger.warning("Could not publish change for %s: %s", resource, e)
+
+    def poll(self, force=False):
+        # Deliver changes made by other processes since the last poll
+        # (force: poll now, waiting for a poll already running in another thread)
+        now = time.monotonic()
+        if not force and now - self.last_poll < self.poll_interval:
+            return 0
+        if not self.poll_lock.acquire(blocking=force):
+            return 0  # Another thread is already polling
+        try:
+            self.last_poll = now
+            conn = self.db.connection()
+            if self.last_seq is None:
+                # Nothing is cached before the first poll, so start from the head
+                self.last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+                return 0
+            rows = conn.execute(
+                "SELECT seq, resource, key, origin FROM changes WHERE seq > ? ORDER BY seq",
+                (self.last_seq,)
+            ).fetchall()
+            if not rows:
+                return 0
+            previous_seq, self.last_seq = self.last_seq, rows[-1][0]
+        except sqlite3.Error as e:
+            logger.warning("Could not poll change feed: %s", e)
+            return 0
+        finally:
+            self.poll_lock.release()
+
+        # Changes were pruned before we saw them: everything may be stale
+        if rows[0][0] != previous_seq + 1:
+            for prefix, callback in self.subscribers:
+                callback(prefix, None)
+            return len(rows)
+
+        # Group keys per resource, skipping changes this process made itself
+        changed = {}
+        pid = os.getpid()
+        for _, resource, key, origin in rows:
+            if origin == pid:
+                continue
+            keys = changed.setdefault(resource, set())
+            if keys is not None:
+                if key is None:
+                    changed[resource] = None
+                else:
+                    keys.add(key)
+
+        for resource, keys in changed.items():
+            for prefix, callback in self.subscribers:
+                if resource.startswith(prefix):
+                    callback(resource, keys)
+        return len(rows)
+
+    def prune(self):
+        # Keep only the most recent max_rows changes
+        self.db.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+                        (self.max_rows,))
+
+
+# Shared feed used by utils.storage and the caches
+change_feed = ChangeFeed()
@@ -0,0 +1,126 @@
+# utils/compression.py
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli  # Optional: preferred over gzip when installed
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is (compression overhead outweighs the gain)
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+# Brotli's top qualities are too slow for per-request compression
+BROTLI_QUALITY = 5
+# Streamed output is collected into chunks of about this size before each flush
+STREAM_CHUNK_SIZE = 16 * 1024
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+def accepts_encoding(request, encoding):
+    # True if the client listed `encoding` in Accept-Encoding with a non-zero quality
+    return request.accept_encodings[encoding] > 0
+
+
+def choose_encoding(request):
+    # Best encoding both sides support: br, then gzip, else None
+    if brotli is not None and accepts_encoding(request, "br"):
+        return "br"
+    if accepts_encoding(request, "gzip"):
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    # (compress(chunk), flush(), finish()) for incremental compression
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.flush, c.finish
+    # wbits 31 = gzip container
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def _encode(chunk):
+    return chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def coalesce(chunks, size=STREAM_CHUNK_SIZE):
+    # Join the many small pieces a streamed template yields into ~size byte chunks
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        chunk = _encode(chunk)
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream_compress(chunks, encoding, size=STREAM_CHUNK_SIZE):
+    """
+    Compress a streamed body incrementally. Each ~size byte chunk is
+    flushed so the client can start rendering before the end, and
+    memory use stays at one chunk regardless of the body length.
+    """
+    compress, flush, finish = _compressor(encoding)
+    for chunk in coalesce(chunks, size):
+        data = compress(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def _wrap_stream(response, wrapper, *args):
+    # Replace the body iterator, still closing the original one afterwards
+    inner = response.response
+    response.response = wrapper(inner, *args)
+    if hasattr(inner, "close"):
+        response.call_on_close(inner.close)
+
+
+def compress_response(request, response, min_size=MIN_COMPRESS_SIZE):
+    """
+    Compress a response with the best encoding the client accepts.
+    Buffered bodies under min_size are left alone; streamed bodies are
+    always compressed, chunk by chunk. A strong ETag becomes weak, because
+    the compressed body is a different byte sequence of the same resource.
+    """
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    if not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request)
+    if response.status_code != 200 or encoding is None:
+        if response.is_streamed:
+            _wrap_stream(response, coalesce)
+        return response
+
+    if response.is_streamed:
+        _wrap_stream(response, stream_compress, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == "br":
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app, min_size=MIN_COMPRESS_SIZE):
+    # Compress every eligible response of the app
+    @app.after_request
+    def _compress(response):
+        return compress_response(request, response, min_size)
+    return app
@@ -0,0 +1,92 @@
+# utils/id_allocator.py
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def locked_file(lock_path):
+    # Exclusive cross-process lock held for the duration of the block
+    with open(lock_path, "a+") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BlockIdAllocator:
+    """
+    Hands out increasing integer IDs from memory.
+    IDs are reserved from the tracker file in blocks of `block_size`;
+    only the block high-water mark is persisted, under a file lock, so
+    several processes never receive the same ID. Unused IDs of a block
+    are skipped when the process exits.
+    """
+
+    def __init__(self, tracker_file, key, block_size=50):
+        self.tracker_file = tracker_file
+        self.key = key
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next_value = 1
+        self.block_end = 0  # Last ID of the current block (inclusive)
+        # A forked child must not reuse the parent's block
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._discard_block)
+
+    def _discard_block(self):
+        self.lock = threading.Lock()
+        self.next_value = 1
+        self.block_end = 0
+
+    def _reserve_block(self, count):
+        with locked_file(self.tracker_file + ".lock"):
+            with open(self.tracker_file, "r") as f:
+                tracker = json.load(f)
+            start = tracker.get(self.key, 0) + 1
+            tracker[self.key] = start + count - 1
+
+            # Write to a temp file and swap it in so a crash never truncates the tracker
+            tmp_path = self.tracker_file + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(tracker, f, indent=4)
+            os.replace(tmp_path, self.tracker_file)
+
+        self.next_value = start
+        self.block_end = start + count - 1
+
+    def next_id(self):
+        # Return the next ID, reserving a new block when the current one is used up
+        with self.lock:
+            if self.next_value > self.block_end:
+                self._reserve_block(self.block_size)
+            value = self.next_value
+            self.next_value += 1
+            return value
+
+    def next_ids(self, count):
+        # Return `count` new IDs at once (used for bulk inserts)
+        with self.lock:
+            ids = []
+            while len(ids) < count:
+                if self.next_value > self.block_end:
+                    self._reserve_block(max(self.block_size, count - len(ids)))
+                ids.append(self.next_value)
+                self.next_value += 1
+            return ids
@@ -0,0 +1,125 @@
+# utils/profiling.py
+import cProfile
+import marshal
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from threading import Lock
+
+from flask import g, request, session
+
+# Header an admin can send to force profiling of a single request
+FORCE_HEADER = "X-Profile-Request"
+
+
+class ProfileStore:
+    def __init__(self, max_entries=50):
+        # Bounded ring buffer: the oldest profile is dropped once full
+        self.entries = deque(maxlen=max_entries)
+        self.lock = Lock()
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.appendleft(entry)
+
+    def list_entries(self):
+        # Return a snapshot, newest first
+        with self.lock:
+            return list(self.entries)
+
+    def get(self, profile_id):
+        with self.lock:
+            return next((e for e in self.entries if e["id"] == profile_id), None)
+
+
+def top_cumulative(stats, limit=15):
+    # Return the functions with the highest cumulative time from a pstats dict
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.items():
+        rows.append({
+            "function": f"{func} ({filename}:{line})",
+            "calls": nc,
+            "total_time": tt,
+            "cumulative_time": ct
+        })
+    rows.sort(key=lambda r: r["cumulative_time"], reverse=True)
+    return rows[:limit]
+
+
+def _should_profile(app):
+    # Admins can force a profile with the header; everything else is sampled
+    user = session.get("user")
+    if request.headers.get(FORCE_HEADER) == "1" and user and user.get("role") == "admin":
+        return True, True
+    return random.random() < app.config["PROFILING_SAMPLE_RATE"], False
+
+
+def init_profiling(app):
+    """
+    Register opt-in request profiling on the Flask app.
+    Requests are sampled (or forced by an admin header) and only
+    profiles slower than PROFILING_THRESHOLD_MS are kept.
+    """
+    app.config.setdefault("PROFILING_ENABLED", False)
+    app.config.setdefault("PROFILING_SAMPLE_RATE", 0.05)
+    app.config.setdefault("PROFILING_THRESHOLD_MS", 500)
+    app.config.setdefault("PROFILING_MAX_ENTRIES", 50)
+
+    store = ProfileStore(app.config["PROFILING_MAX_ENTRIES"])
+    app.extensions["profiling"] = store
+
+    @app.before_request
+    def _start_profile():
+        if not app.config["PROFILING_ENABLED"]:
+            return
+        enabled, forced = _should_profile(app)
+        if not enabled:
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process; skip this request
+            return
+        g._profiler = profiler
+        g._profile_forced = forced
+        g._profile_start = time.perf_counter()
+
+    @app.after_request
+    def _finish_profile(response):
+        profiler = g.pop("_profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - g._profile_start) * 1000
+
+        # Only keep traces for slow requests (forced ones are always kept)
+        if elapsed_ms < app.config["PROFILING_THRESHOLD_MS"] and not g._profile_forced:
+            return response
+
+        stats = pstats.Stats(profiler).stats
+        store.add({
+            "id": uuid.uuid4().hex,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "status": response.status_code,
+            "duration_ms": round(elapsed_ms, 2),
+            "forced": g._profile_forced,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "top_functions": top_cumulative(stats),
+            # Same marshal format pstats.Stats.dump_stats() writes
+            "pstats": marshal.dumps(stats)
+        })
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        # Make sure the profiler is switched off if the view raised
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+
+    return store
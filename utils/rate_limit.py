@@ -0,0 +1,179 @@
+# utils/rate_limit.py
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import Response, g, jsonify, request, session
+
+# Per-route limits, keyed by endpoint name:
+#   limit/period  requests allowed per client in `period` seconds (bursts up to `limit`)
+#   methods       only these methods are limited (None = all)
+#   costly        shed this route first when the server is busy
+DEFAULT_RATE_LIMITS = {
+    "login": {"limit": 10, "period": 60, "methods": ("POST",), "costly": True},
+    "register": {"limit": 5, "period": 300, "methods": ("POST",), "costly": True},
+    "api_stats": {"limit": 30, "period": 60, "methods": None, "costly": True},
+}
+# Client buckets kept in memory before the least recently used ones are dropped
+MAX_TRACKED_KEYS = 10000
+# Requests handled at once by one process before new ones get a 503
+MAX_IN_FLIGHT = 32
+# Costly routes are shed once this share of MAX_IN_FLIGHT is in use
+COSTLY_SHED_RATIO = 0.75
+
+
+class TokenBuckets:
+    """
+    Token buckets for many clients in a bounded LRU map.
+    Each key holds just (tokens, last update); tokens refill continuously
+    at limit/period per second up to limit. A key that has been idle for
+    a full period is back at a full bucket, so evicting it loses nothing;
+    when the map is full the least recently used key is evicted.
+    """
+
+    def __init__(self, max_keys=MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()   # key -> (tokens, updated)
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def take(self, key, limit, period, now=None):
+        # Spend one token; returns 0 if allowed, else seconds until the next token
+        now = time.monotonic() if now is None else now
+        rate = limit / period
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+        return wait
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+class RateLimiter:
+    """
+    Per-route token-bucket limits (per client IP and per user) plus load
+    shedding: once too many requests are in flight in this process, new
+    ones are answered with an immediate 503 instead of queuing.
+    """
+
+    def __init__(self, limits, max_in_flight=MAX_IN_FLIGHT, max_keys=MAX_TRACKED_KEYS):
+        self.limits = limits
+        self.max_in_flight = max_in_flight
+        self.buckets = TokenBuckets(max_keys)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters = defaultdict(lambda: {"allowed": 0, "limited": 0, "shed": 0})
+
+    def enter(self, endpoint):
+        # Admit a request unless the process is overloaded; returns False to shed it
+        rule = self.limits.get(endpoint)
+        threshold = self.max_in_flight
+        if rule and rule.get("costly"):
+            threshold = max(1, int(self.max_in_flight * COSTLY_SHED_RATIO))
+        with self.lock:
+            if self.in_flight >= threshold:
+                self.counters[endpoint]["shed"] += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def check(self, endpoint, method, client_keys):
+        # Seconds to wait if any of the client's buckets is empty, else 0
+        rule = self.limits.get(endpoint)
+        if not rule or (rule.get("methods") and method not in rule["methods"]):
+            return 0
+        wait = 0
+        for key in client_keys:
+            wait = max(wait, self.buckets.take(f"{endpoint}|{key}", rule["limit"], rule["period"]))
+        with self.lock:
+            self.counters[endpoint]["limited" if wait else "allowed"] += 1
+        return wait
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "tracked_keys": len(self.buckets),
+                "evicted_keys": self.buckets.evicted,
+                "limits": self.limits,
+                "endpoints": {name: dict(c) for name, c in self.counters.items()},
+            }
+
+
+def _client_keys():
+    # One bucket per IP, plus one per logged-in user. A login attempt names
+    # an account anyone can type, so it is keyed on (IP, username): other
+    # clients cannot use up a victim's bucket and lock them out.
+    keys = [f"ip:{request.remote_addr}"]
+    username = (session.get("user") or {}).get("username")
+    if username:
+        keys.append(f"user:{username}")
+    elif request.method == "POST" and request.form.get("username"):
+        keys.append(f"login:{request.remote_addr}:{request.form['username']}")
+    return keys
+
+
+def _reject(status, message, retry_after):
+    # Small, fast refusal; JSON for API routes, plain text otherwise
+    if request.path.startswith("/api/"):
+        response = jsonify({"error": message})
+    else:
+        response = Response(message, mimetype="text/plain")
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_rate_limiting(app):
+    """
+    Register rate limiting and load shedding on the Flask app.
+    Limits come from RATE_LIMITS (see DEFAULT_RATE_LIMITS), the in-flight
+    cap from MAX_IN_FLIGHT. Call before other before_request hooks so
+    rejected requests cost as little as possible.
+    """
+    app.config.setdefault("RATE_LIMITS", DEFAULT_RATE_LIMITS)
+    app.config.setdefault("MAX_IN_FLIGHT", MAX_IN_FLIGHT)
+    app.config.setdefault("RATE_LIMIT_MAX_KEYS", MAX_TRACKED_KEYS)
+
+    limiter = RateLimiter(app.config["RATE_LIMITS"], app.config["MAX_IN_FLIGHT"],
+                          app.config["RATE_LIMIT_MAX_KEYS"])
+    app.extensions["rate_limiter"] = limiter
+
+    @app.before_request
+    def _admit_request():
+        endpoint = request.endpoint
+        if endpoint == "static":
+            return None
+        if not limiter.enter(endpoint):
+            return _reject(503, "Server busy, please retry shortly.", 1)
+        g._rate_limit_admitted = True
+        wait = limiter.check(endpoint, request.method, _client_keys())
+        if wait:
+            return _reject(429, "Too many requests, please slow down.", wait)
+        return None
+
+    @app.teardown_request
+    def _release_request(exc):
+        if g.pop("_rate_limit_admitted", False):
+            limiter.leave()
+
+    return limiter
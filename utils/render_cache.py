@@ -0,0 +1,51 @@
+# utils/render_cache.py
+from collections import OrderedDict
+from threading import Lock
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered HTML fragments.
+    Entries are keyed by (kind, product_id) and stored with the product
+    version they were rendered from, so a stale entry is never served.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, kind, product_id, version):
+        # Return cached HTML if it was rendered from the same product version
+        with self.lock:
+            entry = self.entries.get((kind, product_id))
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end((kind, product_id))
+            return entry[1]
+
+    def set(self, kind, product_id, version, html):
+        with self.lock:
+            self.entries[(kind, product_id)] = (version, html)
+            self.entries.move_to_end((kind, product_id))
+            # Evict least recently used entries once over capacity
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_render(self, kind, product_id, version, render):
+        # Return the cached fragment or render, store and return it
+        html = self.get(kind, product_id, version)
+        if html is None:
+            html = render()
+            self.set(kind, product_id, version, html)
+        return html
+
+    def invalidate(self, product_id):
+        # Drop every fragment rendered for this product
+        with self.lock:
+            for key in [k for k in self.entries if k[1] == product_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
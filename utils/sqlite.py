@@ -0,0 +1,62 @@
+# utils/sqlite.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteDB:
+    """
+    One SQLite database file shared by all worker processes.
+    Each thread keeps its own connection (opened in autocommit mode with
+    WAL journaling, so readers never wait for the writer), the schema
+    statements run once per connection, and a forked child opens fresh
+    connections instead of reusing its parent's.
+    """
+
+    def __init__(self, path, schema=(), timeout=10):
+        self.path = path
+        self.schema = tuple(schema)
+        self.timeout = timeout
+        self.local = threading.local()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            self.local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.connection().executemany(sql, rows)
+
+    @contextmanager
+    def transaction(self):
+        # Exclusive write transaction across all processes; yields the connection
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        # Close this thread's connection (e.g. at the end of a worker process job)
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
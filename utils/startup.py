@@ -0,0 +1,146 @@
+# utils/startup.py
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Modules shown in the import section of the report
+REPORT_TOP_IMPORTS = 25
+
+
+class _TimedLoader(importlib.abc.Loader):
+    # Wraps a module's real loader and times its execution
+
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.enter()
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.leave(module.__name__, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        # get_source, is_package, resource readers, ... of the real loader
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Meta path hook that records how long each module takes to import.
+    "total" includes the modules it imports in turn; "self" excludes
+    them, so the slow module is the one with the large self time.
+    """
+
+    def __init__(self):
+        self.timings = {}      # module name -> (self seconds, total seconds)
+        self.local = threading.local()
+        self.finding = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self.finding, "active", False):
+            return None
+        # Ask the remaining finders, then wrap whatever loader they return
+        self.finding.active = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self.finding.active = False
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def enter(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)  # time spent in nested imports
+
+    def leave(self, name, elapsed):
+        stack = self.local.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self.timings[name] = (elapsed - nested, elapsed)
+
+
+# Process-wide startup measurements
+_import_timer = None
+_phases = []
+_started = time.perf_counter()
+_finished = None
+
+
+def install_import_timer():
+    # Start timing imports (call before the application modules are imported)
+    global _import_timer
+    if _import_timer is None:
+        _import_timer = ImportTimer()
+        sys.meta_path.insert(0, _import_timer)
+    return _import_timer
+
+
+def uninstall_import_timer():
+    if _import_timer in sys.meta_path:
+        sys.meta_path.remove(_import_timer)
+
+
+@contextmanager
+def phase(name):
+    # Time one warm-up step: `with startup.phase("products"): ...`
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def finish():
+    # Mark startup as complete and log the report
+    global _finished
+    _finished = time.perf_counter()
+    uninstall_import_timer()
+    report = startup_report()
+    logger.info("Startup took %.1f ms (imports %.1f ms, warm-up %.1f ms)",
+                report["total_ms"], report["imports_ms"], report["warm_up_ms"])
+    return report
+
+
+def startup_report(top=REPORT_TOP_IMPORTS):
+    """
+    Startup cost breakdown: the slowest module imports (self and total
+    time) and each warm-up phase, in milliseconds.
+    """
+    timings = _import_timer.timings if _import_timer else {}
+    imports = sorted(timings.items(), key=lambda kv: kv[1][0], reverse=True)
+    end = _finished if _finished is not None else time.perf_counter()
+    return {
+        "total_ms": round((end - _started) * 1000, 1),
+        "imports_ms": round(sum(t[0] for t in timings.values()) * 1000, 1),
+        "modules_imported": len(timings),
+        "imports": [
+            {"module": name, "self_ms": round(t[0] * 1000, 2), "total_ms": round(t[1] * 1000, 2)}
+            for name, t in imports[:top]
+        ],
+        "warm_up_ms": round(sum(d for _, d in _phases) * 1000, 1),
+        "phases": [{"phase": name, "ms": round(d * 1000, 2)} for name, d in _phases],
+        "finished": _finished is not None,
+    }
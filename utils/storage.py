@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+from utils.change_feed import change_feed
 
 def load_data(filepath):
     """
@@ -11,9 +13,16 @@ def load_data(filepath):
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def save_data(filepath, data):
+def save_data(filepath, data, changed_keys=None):
     """
     Save data as JSON to the given file path.
+    The file is written to a temporary name and renamed into place, so
+    readers (e.g. report worker processes) always see a complete file.
+    The write is announced on the change feed so other workers can
+    invalidate their caches (only changed_keys, if given).
     """
-    with open(filepath, "w", encoding="utf-8") as f:
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
+    os.replace(tmp_path, filepath)
+    change_feed.publish(filepath, changed_keys)